@@ -1,13 +1,10 @@
 """CLI entry point for claude-tg."""
-import json
 import sys
 import argparse
 import logging
 import os
-from pathlib import Path
 
 from .config import Config
-from .bot import ClaudeTelegramBot
 
 
 def main():
@@ -52,17 +49,26 @@ def main():
 
     _ensure_mcp(config.work_dir)
 
+    # Deferred: pulls in python-telegram-bot, which --help and config errors don't need.
+    from .bot import ClaudeTelegramBot
+
     bot = ClaudeTelegramBot(config)
     bot.run()
 
 
 def _ensure_mcp(work_dir: str):
     """Register claude-tg MCP server in .mcp.json (no CLI dependency)."""
+    import json
+    from pathlib import Path
+
     logger = logging.getLogger(__name__)
     mcp_path = Path(work_dir) / ".mcp.json"
     entry = {"type": "stdio", "command": "claude-tg-mcp", "args": [], "env": {}}
     try:
-        data = json.loads(mcp_path.read_text()) if mcp_path.exists() else {}
+        try:
+            data = json.loads(mcp_path.read_text())
+        except FileNotFoundError:
+            data = {}
         servers = data.setdefault("mcpServers", {})
         if servers.get("claude-tg") == entry:
             logger.debug("claude-tg MCP server already registered")
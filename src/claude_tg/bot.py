@@ -1,4 +1,5 @@
 """Telegram bot setup, handlers, and session management."""
+import io
 import json
 import os
 import sys
@@ -135,6 +136,7 @@ class ClaudeTelegramBot:
             work_dir=config.work_dir,
             model=config.model,
             max_budget=config.max_budget,
+            isolate_cpu=config.isolate_cpu,
         )
         self.media = MediaHandler(
             upload_dir=os.path.join(config.work_dir, "claude-tg-uploads")
@@ -147,14 +149,16 @@ class ClaudeTelegramBot:
         self._session_cost: float = 0.0
 
         # Debounce state
-        self._buffer: list[str] = []
+        self._buffer = io.StringIO()
         self._buffer_photos: list[str] = []
         self._buffer_docs: list[str] = []
+        self._debounce_handle: asyncio.TimerHandle | None = None
         self._debounce_task: asyncio.Task | None = None
         self._debounce_timeout = 0.5
         self._pending_context: ContextTypes.DEFAULT_TYPE | None = None
 
         # Mid-turn injection state
+        self._inject_handle: asyncio.TimerHandle | None = None
         self._inject_task: asyncio.Task | None = None
         self._pending_injections: int = 0
 
@@ -235,7 +239,7 @@ class ClaudeTelegramBot:
         if self.runner.is_processing:
             await update.message.reply_text("⚠️ Claude is busy. Use /cancel first.")
             return
-        self._buffer.append("/compact")
+        self._buffer_text("/compact")
         await self._process_buffer(context)
 
     async def cmd_cost(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -270,7 +274,7 @@ class ClaudeTelegramBot:
             "дожидаясь текущей работы, пусть работает параллельно. Когда субагент вернёт — "
             "пришли результат отдельным сообщением.\n\nВопрос: " + question
         )
-        self._buffer.append(prompt)
+        self._buffer_text(prompt)
         await self._schedule_debounce(context)
         await update.message.reply_text(f"🤖 Субагент запущен параллельно: {question[:60]}")
 
@@ -580,7 +584,7 @@ class ClaudeTelegramBot:
         logger.info(f"text msg: len={len(text)}, fwd={bool(fwd)}")
         if fwd:
             text = f"{fwd}:\n{text}"
-        self._buffer.append(text)
+        self._buffer_text(text)
         await self._schedule_debounce(context)
 
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -600,11 +604,11 @@ class ClaudeTelegramBot:
         fwd = _format_forward_origin(update.message)
         logger.info(f"photo msg: caption_len={len(caption or '')}, fwd={bool(fwd)}")
         if fwd and caption:
-            self._buffer.append(f"{fwd}:\n{caption}")
+            self._buffer_text(f"{fwd}:\n{caption}")
         elif fwd:
-            self._buffer.append(f"{fwd} (фото без подписи)")
+            self._buffer_text(f"{fwd} (фото без подписи)")
         elif caption:
-            self._buffer.append(caption)
+            self._buffer_text(caption)
         await self._schedule_debounce(context)
 
     async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -624,11 +628,11 @@ class ClaudeTelegramBot:
         fwd = _format_forward_origin(update.message)
         logger.info(f"doc msg: caption_len={len(caption or '')}, fwd={bool(fwd)}")
         if fwd and caption:
-            self._buffer.append(f"{fwd}:\n{caption}")
+            self._buffer_text(f"{fwd}:\n{caption}")
         elif fwd:
-            self._buffer.append(f"{fwd} (файл без подписи)")
+            self._buffer_text(f"{fwd} (файл без подписи)")
         elif caption:
-            self._buffer.append(caption)
+            self._buffer_text(caption)
         await self._schedule_debounce(context)
 
     async def handle_audio(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -656,9 +660,9 @@ class ClaudeTelegramBot:
         if fwd:
             note = f"{fwd} {note}"
         if caption:
-            self._buffer.append(f"{note}:\n{caption}")
+            self._buffer_text(f"{note}:\n{caption}")
         else:
-            self._buffer.append(note)
+            self._buffer_text(note)
         await self._schedule_debounce(context)
 
     async def handle_voice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -675,7 +679,7 @@ class ClaudeTelegramBot:
             if text:
                 if fwd:
                     text = f"{fwd}:\n{text}"
-                self._buffer.append(text)
+                self._buffer_text(text)
                 await self._schedule_debounce(context)
         except Exception as e:
             logger.exception("Voice transcription failed")
@@ -726,50 +730,56 @@ class ClaudeTelegramBot:
         parts.append(f"[{kind}]")
         if caption:
             parts.append(caption)
-        self._buffer.append(" ".join(parts) if not caption else f"{' '.join(parts[:-1])}:\n{caption}")
+        self._buffer_text(" ".join(parts) if not caption else f"{' '.join(parts[:-1])}:\n{caption}")
         await self._schedule_debounce(context)
 
+    def _take_buffer(self) -> tuple[str, list[str], list[str]]:
+        """Detach the pending text/photos/docs, leaving fresh empty buffers."""
+        text, photos, docs = self._buffer.getvalue(), self._buffer_photos, self._buffer_docs
+        self._buffer, self._buffer_photos, self._buffer_docs = io.StringIO(), [], []
+        return text, photos, docs
+
+    def _buffer_text(self, text: str):
+        """Append a message to the debounce buffer (newline-separated)."""
+        if self._buffer.tell():
+            self._buffer.write("\n")
+        self._buffer.write(text)
+
     async def _schedule_debounce(self, context: ContextTypes.DEFAULT_TYPE):
+        # A burst of updates just re-arms one TimerHandle; no task is created
+        # (or cancelled) until the quiet period actually elapses.
+        loop = asyncio.get_running_loop()
+
         if self.runner.is_processing:
             self._pending_context = context
 
             # If process alive, inject mid-turn via stdin instead of just buffering
             if self.runner.process_alive:
-                if self._inject_task:
-                    self._inject_task.cancel()
-                    try:
-                        await self._inject_task
-                    except asyncio.CancelledError:
-                        pass
-
-                async def _fire_inject():
-                    await asyncio.sleep(self._debounce_timeout)
-                    await self._inject_mid_turn()
-
-                self._inject_task = asyncio.create_task(_fire_inject())
+                if self._inject_handle:
+                    self._inject_handle.cancel()
+                self._inject_handle = loop.call_later(
+                    self._debounce_timeout, self._fire_inject
+                )
             return
 
-        if self._debounce_task:
-            self._debounce_task.cancel()
-            try:
-                await self._debounce_task
-            except asyncio.CancelledError:
-                pass
+        if self._debounce_handle:
+            self._debounce_handle.cancel()
+        self._debounce_handle = loop.call_later(
+            self._debounce_timeout, self._fire_debounce, context
+        )
 
-        async def _fire():
-            await asyncio.sleep(self._debounce_timeout)
-            await self._process_buffer(context)
+    def _fire_debounce(self, context: ContextTypes.DEFAULT_TYPE):
+        self._debounce_handle = None
+        # Keep a reference: the loop only holds tasks weakly.
+        self._debounce_task = asyncio.create_task(self._process_buffer(context))
 
-        self._debounce_task = asyncio.create_task(_fire())
+    def _fire_inject(self):
+        self._inject_handle = None
+        self._inject_task = asyncio.create_task(self._inject_mid_turn())
 
     async def _inject_mid_turn(self):
         """Send buffered messages to running process via stdin."""
-        text = "\n".join(self._buffer)
-        photos = list(self._buffer_photos)
-        docs = list(self._buffer_docs)
-        self._buffer.clear()
-        self._buffer_photos.clear()
-        self._buffer_docs.clear()
+        text, photos, docs = self._take_buffer()
 
         if not text and not photos and not docs:
             return
@@ -784,7 +794,7 @@ class ClaudeTelegramBot:
         except RuntimeError:
             # Process died — re-buffer for normal flow
             if text:
-                self._buffer.append(text)
+                self._buffer_text(text)
             self._buffer_photos.extend(photos)
             self._buffer_docs.extend(docs)
             logger.warning("Mid-turn inject failed, re-buffered")
@@ -894,12 +904,7 @@ class ClaudeTelegramBot:
 
     async def _process_buffer(self, context: ContextTypes.DEFAULT_TYPE):
         """Process accumulated buffer."""
-        text = "\n".join(self._buffer)
-        photos = list(self._buffer_photos)
-        docs = list(self._buffer_docs)
-        self._buffer.clear()
-        self._buffer_photos.clear()
-        self._buffer_docs.clear()
+        text, photos, docs = self._take_buffer()
 
         if not text and not photos and not docs:
             return
@@ -968,7 +973,7 @@ class ClaudeTelegramBot:
             self.runner.is_processing = False
             self._stream = None
             # Process messages that arrived but weren't injected
-            if self._buffer or self._buffer_photos or self._buffer_docs:
+            if self._buffer.tell() or self._buffer_photos or self._buffer_docs:
                 ctx = self._pending_context or context
                 self._pending_context = None
                 await self._schedule_debounce(ctx)
@@ -1068,7 +1073,7 @@ class ClaudeTelegramBot:
 
                     # Inject into the normal message pipeline
                     ctx = type("_Ctx", (), {"bot": self._app.bot})()
-                    self._buffer.append(prompt)
+                    self._buffer_text(prompt)
                     await self._schedule_debounce(ctx)
             else:
                 writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 5\r\n\r\nempty")
@@ -1173,4 +1178,7 @@ class ClaudeTelegramBot:
 
         logger.info(f"Starting claude-tg, work_dir={self.config.work_dir}")
         app = self.build_app()
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+        try:
+            app.run_polling(allowed_updates=Update.ALL_TYPES)
+        finally:
+            self.conversation_log.close()
@@ -1,30 +1,49 @@
 """Configuration from environment variables."""
 import os
-import sys
+from dataclasses import dataclass, field
 
 
+def _env(name: str, default: str | None = None, **kw):
+    return field(default_factory=lambda: os.environ.get(name, default), **kw)
+
+
+def _env_num(cast, name: str, default: str):
+    return field(default_factory=lambda: cast(os.environ.get(name, default)))
+
+
+def _env_flag(name: str):
+    return field(default_factory=lambda: os.environ.get(name, "0") == "1")
+
+
+def _env_dir(name: str):
+    """Directory from the environment, defaulting to the cwd at construction."""
+    return field(default_factory=lambda: os.environ.get(name, os.getcwd()))
+
+
+def _env_budget() -> float | None:
+    v = os.environ.get("CLAUDE_TG_MAX_BUDGET")
+    return float(v) if v else None
+
+
+@dataclass(slots=True)
 class Config:
-    """Load and validate configuration from env vars."""
-
-    def __init__(self):
-        self.bot_token: str = os.environ.get("TELEGRAM_BOT_TOKEN", "")
-        self.chat_id: int = int(os.environ.get("TELEGRAM_CHAT_ID", "0"))
-        self.work_dir: str = os.environ.get("CLAUDE_WORK_DIR", os.getcwd())
-        self.verbose: bool = os.environ.get("CLAUDE_TG_VERBOSE", "0") == "1"
-        self.model: str | None = os.environ.get("CLAUDE_TG_MODEL")
-        self.max_budget: float | None = (
-            float(v) if (v := os.environ.get("CLAUDE_TG_MAX_BUDGET")) else None
-        )
-        self.session_timeout: int = int(
-            os.environ.get("CLAUDE_TG_SESSION_TIMEOUT", "3600")
-        )
-        self.update_interval: float = float(
-            os.environ.get("CLAUDE_TG_UPDATE_INTERVAL", "2.0")
-        )
-        self.groq_api_key: str | None = os.environ.get("GROQ_API_KEY")
-        self.trigger_port: int = int(
-            os.environ.get("CLAUDE_TG_TRIGGER_PORT", "0")
-        )
+    """Load and validate configuration from env vars.
+
+    Each field is read from the environment once, at construction; explicit
+    keyword arguments override the environment. Secrets are left out of repr().
+    """
+
+    bot_token: str = _env("TELEGRAM_BOT_TOKEN", "", repr=False)
+    chat_id: int = _env_num(int, "TELEGRAM_CHAT_ID", "0")
+    work_dir: str = _env_dir("CLAUDE_WORK_DIR")
+    verbose: bool = _env_flag("CLAUDE_TG_VERBOSE")
+    model: str | None = _env("CLAUDE_TG_MODEL")
+    max_budget: float | None = field(default_factory=_env_budget)
+    session_timeout: int = _env_num(int, "CLAUDE_TG_SESSION_TIMEOUT", "3600")
+    update_interval: float = _env_num(float, "CLAUDE_TG_UPDATE_INTERVAL", "2.0")
+    groq_api_key: str | None = _env("GROQ_API_KEY", repr=False)
+    trigger_port: int = _env_num(int, "CLAUDE_TG_TRIGGER_PORT", "0")
+    isolate_cpu: bool = _env_flag("CLAUDE_TG_ISOLATE_CPU")
 
     def validate(self) -> list[str]:
         """Return list of validation errors. Empty = valid."""
@@ -4,12 +4,17 @@ Captures everything the user sees in Telegram: their messages, trigger prompts,
 DIRECT alerts, and Feanor's responses. Skills/heartbeat/worker read this to get
 the same context the user has.
 """
-import json
 import os
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+from . import fastjson
+
+_TAIL_CHUNK = 8192
+
+_PREFIX = {"user": "👤", "assistant": "🤖", "trigger": "📥", "direct": "📢", "review": "📋"}
+
 
 class ConversationLog:
     """Append-only JSONL conversation log with reading support."""
@@ -17,11 +22,32 @@ class ConversationLog:
     def __init__(self, work_dir: str, filename: str = "data/conversation_log.jsonl"):
         self.path = Path(work_dir) / filename
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        # (mtime_ns, size, limit, max_chars) → formatted context
+        self._fmt_cache: tuple[tuple[int, int, int, int], str] | None = None
+        self._fh = None  # append handle, opened on first write
 
     def _write(self, entry: dict):
         entry["ts"] = datetime.now(timezone.utc).isoformat()
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if self._fh is not None and self._rotated():
+            self.close()
+        if self._fh is None:
+            # Unbuffered O_APPEND: each entry lands as a single write(), so
+            # lines from the bot and the MCP server never interleave.
+            self._fh = open(self.path, "ab", buffering=0)
+        self._fh.write(fastjson.dumps_line(entry))
+
+    def _rotated(self) -> bool:
+        """True if the file behind our handle was moved or deleted (logrotate, rm)."""
+        try:
+            return os.fstat(self._fh.fileno()).st_ino != os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return True
+
+    def close(self):
+        """Close the append handle (reopened lazily on the next write)."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
 
     def log_user(self, text: str, files: list[dict] | None = None):
         """User message from Telegram. `files` is a list of {file_id, filename, kind, path}.
@@ -65,32 +91,48 @@ class ConversationLog:
         if text.strip():
             self._write({"role": "review", "text": text})
 
+    def _tail_lines(self, limit: int) -> list[bytes]:
+        """Return up to `limit` last non-empty lines, reading the file backwards.
+
+        The log is append-only and grows unbounded, so only the tail is read:
+        cost depends on `limit`, not on file size.
+        """
+        lines: list[bytes] = []
+        with open(self.path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            buf = b""
+            while pos > 0 and len(lines) < limit:
+                step = min(_TAIL_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                # Everything after the first newline is complete; the head may
+                # be a partial line continuing into the previous chunk.
+                head, sep, complete = buf.partition(b"\n") if pos else (b"", b"", buf)
+                if not sep and pos:
+                    continue
+                for line in reversed(complete.split(b"\n")):
+                    if line.strip():
+                        lines.append(line)
+                        if len(lines) >= limit:
+                            break
+                buf = head
+        lines.reverse()
+        return lines
+
     def get_recent(self, limit: int = 50, max_chars: int = 30000) -> list[dict]:
         """Read recent entries, respecting both count and size limits."""
         if not self.path.exists():
             return []
 
-        # Read from the end efficiently
-        lines = []
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+            recent_lines = self._tail_lines(limit)
         except OSError:
             return []
 
-        # Take last `limit` lines
-        recent_lines = lines[-limit:]
-
         entries = []
         total_chars = 0
-        for line in reversed(recent_lines):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                entry = json.loads(line)
-            except json.JSONDecodeError:
-                continue
+        for entry in reversed(self._parse_lines(recent_lines)):
             text_len = len(entry.get("text", ""))
             if total_chars + text_len > max_chars and entries:
                 break
@@ -100,30 +142,69 @@ class ConversationLog:
         entries.reverse()
         return entries
 
+    @staticmethod
+    def _parse_lines(lines: list[bytes]) -> list[dict]:
+        """Decode JSONL lines, skipping any that are corrupt or not objects.
+
+        The common all-valid case is parsed as one JSON array in a single
+        decoder call. That is only trusted if it yields exactly one object per
+        line (a fragment like `1, {...}` would otherwise split into several
+        shifted records); anything else falls back to per-line decoding.
+        """
+        if not lines:
+            return []
+        try:
+            entries = fastjson.loads(b"[" + b",".join(lines) + b"]")
+        except (fastjson.JSONDecodeError, UnicodeDecodeError):
+            pass
+        else:
+            if len(entries) == len(lines) and all(type(e) is dict for e in entries):
+                return entries
+        entries = []
+        for line in lines:
+            try:
+                entry = fastjson.loads(line)
+            except (fastjson.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if isinstance(entry, dict):
+                entries.append(entry)
+        return entries
+
     def format_context(self, limit: int = 30, max_chars: int = 100000) -> str:
-        """Format recent messages as readable context for injection into prompts."""
-        entries = self.get_recent(limit=limit, max_chars=max_chars)
+        """Format recent messages as readable context for injection into prompts.
+
+        The result is cached until the log file changes (mtime or size).
+        """
+        try:
+            st = self.path.stat()
+        except OSError:
+            return ""
+        key = (st.st_mtime_ns, st.st_size, limit, max_chars)
+        if self._fmt_cache is not None and self._fmt_cache[0] == key:
+            return self._fmt_cache[1]
+
+        context = self._format_entries(self.get_recent(limit=limit, max_chars=max_chars))
+        self._fmt_cache = (key, context)
+        return context
+
+    @staticmethod
+    def _format_entries(entries: list[dict]) -> str:
         if not entries:
             return ""
 
-        lines = []
-        for e in entries:
-            role = e.get("role", "?")
-            if role == "upload":
-                continue  # служебная запись file_id, не для контекста
-            text = e.get("text", "")
-            ts = e.get("ts", "")
-            time_str = ""
-            if ts:
-                try:
-                    dt = datetime.fromisoformat(ts)
-                    time_str = dt.strftime("%H:%M")
-                except ValueError:
-                    pass
-
-            prefix = {"user": "👤", "assistant": "🤖", "trigger": "📥", "direct": "📢", "review": "📋"}.get(role, "?")
-            source = e.get("source", "")
-            source_tag = f" [{source}]" if source else ""
-            lines.append(f"[{time_str}] {prefix}{source_tag} {text}")
-
-        return "\n".join(lines)
+        def _lines():
+            for e in entries:
+                role = e.get("role", "?")
+                if role == "upload":
+                    continue  # служебная запись file_id, не для контекста
+                text = e.get("text", "")
+                # ts is written by _write as isoformat(): HH:MM sits at [11:16]
+                ts = e.get("ts", "")
+                time_str = ts[11:16] if len(ts) >= 16 else ""
+
+                prefix = _PREFIX.get(role, "?")
+                source = e.get("source", "")
+                source_tag = f" [{source}]" if source else ""
+                yield f"[{time_str}] {prefix}{source_tag} {text}"
+
+        return "\n".join(_lines())
@@ -0,0 +1,36 @@
+"""JSON encode/decode for hot paths: orjson when installed, stdlib otherwise.
+
+Both sides work with UTF-8 bytes so callers can read and write binary files
+and pipes without an extra str round-trip. `orjson.JSONDecodeError` subclasses
+`json.JSONDecodeError`, so callers catch the stdlib exception either way.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: pip install claude-tg[fast]
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        """Serialize `obj` to compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj)
+
+    def dumps_line(obj) -> bytes:
+        """Serialize `obj` as one NDJSON line (trailing newline included)."""
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+else:
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        """Serialize `obj` to compact UTF-8 JSON bytes."""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def dumps_line(obj) -> bytes:
+        """Serialize `obj` as one NDJSON line (trailing newline included)."""
+        return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
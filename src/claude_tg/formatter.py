@@ -1,63 +1,76 @@
 """Convert Claude's Markdown output to Telegram HTML."""
 import re
 
+_RE_FENCE = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
+_RE_INLINE_CODE = re.compile(r"`([^`\n]+)`")
+_RE_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_RE_ITALIC = re.compile(r"(?<!\*)\*([^*\n]+)\*(?!\*)")
+_RE_LINK = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+_RE_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+# Any character that can start a Markdown construct handled below
+_RE_MD_CHARS = re.compile(r"[`*\[]")
+
+_HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;", "<": "&lt;", ">": "&gt;", "'": "&#x27;", '"': "&quot;",
+})
+
 
 def escape_html(text: str) -> str:
     """Escape HTML special characters."""
-    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("'", "&#x27;").replace('"', "&quot;")
+    return text.translate(_HTML_ESCAPE_TABLE)
 
 
 def md_to_html(text: str) -> str:
     """
     Convert Markdown to Telegram-compatible HTML.
 
-    Strategy: extract code blocks first (protect them), convert inline
-    formatting, then reassemble.
+    Strategy: extract code behind placeholders (fenced blocks first, so a
+    stray backtick earlier on the line can't swallow a fence, then inline
+    spans), convert inline formatting, then reassemble in one scan.
     """
     if not text:
         return ""
+    if not _RE_MD_CHARS.search(text):
+        return escape_html(text)
 
-    # Extract code blocks and replace with placeholders
-    blocks: list[str] = []
+    # NUL delimits the placeholders below; input can't be allowed to forge one.
+    if "\x00" in text:
+        text = text.replace("\x00", "")
+    codes: list[str] = []
 
     def _save_block(m: re.Match) -> str:
-        lang = m.group(1) or ""
-        code = escape_html(m.group(2))
+        lang = m.group(1)
         cls = f' class="language-{lang}"' if lang else ""
-        blocks.append(f"<pre><code{cls}>{code}</code></pre>")
-        return f"\x00BLOCK{len(blocks) - 1}\x00"
-
-    result = re.sub(r"```(\w*)\n(.*?)```", _save_block, text, flags=re.DOTALL)
-
-    # Extract inline code
-    inline_codes: list[str] = []
+        codes.append(f"<pre><code{cls}>{escape_html(m.group(2))}</code></pre>")
+        return f"\x00{len(codes) - 1}\x00"
 
     def _save_inline(m: re.Match) -> str:
-        inline_codes.append(f"<code>{escape_html(m.group(1))}</code>")
-        return f"\x00INLINE{len(inline_codes) - 1}\x00"
+        codes.append(f"<code>{escape_html(m.group(1))}</code>")
+        return f"\x00{len(codes) - 1}\x00"
 
-    result = re.sub(r"`([^`\n]+)`", _save_inline, result)
+    result = _RE_FENCE.sub(_save_block, text) if "```" in text else text
+    result = _RE_INLINE_CODE.sub(_save_inline, result)
 
     # Escape remaining HTML
     result = escape_html(result)
 
     # Bold **...**
-    result = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", result)
+    result = _RE_BOLD.sub(r"<b>\1</b>", result)
 
     # Italic *...* (not inside words, not **)
-    result = re.sub(r"(?<!\*)\*([^*\n]+)\*(?!\*)", r"<i>\1</i>", result)
+    result = _RE_ITALIC.sub(r"<i>\1</i>", result)
 
     # Links [text](url)
-    result = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r'<a href="\2">\1</a>', result)
+    result = _RE_LINK.sub(r'<a href="\2">\1</a>', result)
 
-    # Restore inline code
-    for i, code in enumerate(inline_codes):
-        result = result.replace(f"\x00INLINE{i}\x00", code)
-
-    # Restore code blocks
-    for i, block in enumerate(blocks):
-        result = result.replace(f"\x00BLOCK{i}\x00", block)
+    # Restore all code spans in a single scan. An inline span can itself wrap
+    # a fence placeholder, so restored spans are scanned again.
+    def _restore(m: re.Match) -> str:
+        code = codes[int(m.group(1))]
+        return _RE_PLACEHOLDER.sub(_restore, code) if "\x00" in code else code
 
+    if codes:
+        result = _RE_PLACEHOLDER.sub(_restore, result)
     return result
 
 
@@ -75,15 +88,21 @@ _TOOL_ICONS = {
 }
 
 
+def _short_path(path: str) -> str:
+    """Last two path components ("src/main.py"), sliced without splitting."""
+    i = path.rfind("/")
+    if i < 0:
+        return path
+    return path[path.rfind("/", 0, i) + 1:]
+
+
 def format_tool_call(name: str, input_data: dict) -> str:
     """Format a tool call as a compact one-liner."""
     icon = _TOOL_ICONS.get(name, "\U0001f527")
 
     if name in ("Read", "Edit", "Write"):
         path = input_data.get("file_path", "")
-        # Show just filename or last 2 path components
-        short = "/".join(path.rsplit("/", 2)[-2:]) if "/" in path else path
-        return f"{icon} {name}: {short}"
+        return f"{icon} {name}: {_short_path(path)}"
 
     if name == "Bash":
         cmd = input_data.get("command", "")
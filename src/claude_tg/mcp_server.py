@@ -1,7 +1,9 @@
 """MCP server for sending files, reading conversation history, and asking user questions."""
 import asyncio
+import contextlib
 import json
 import os
+import stat
 import uuid
 from pathlib import Path
 
@@ -9,7 +11,84 @@ from mcp.server.fastmcp import FastMCP
 
 from .conversation_log import ConversationLog
 
-mcp = FastMCP("claude-tg")
+# (event loop, token, task resolving to an initialized Bot); see _get_bot
+_bot_entry: tuple[asyncio.AbstractEventLoop, str, asyncio.Task] | None = None
+
+
+async def _get_bot(token: str):
+    """Shared, initialized Bot for this token on the running event loop.
+
+    Reusing one Bot keeps its HTTP connection pool (and TLS sessions) warm
+    across tool calls. Concurrent first callers await the same init task.
+    A Bot replaced on the same loop (token changed) is shut down.
+    """
+    global _bot_entry
+    loop = asyncio.get_running_loop()
+    entry = _bot_entry
+    if (
+        entry is None
+        or entry[0] is not loop
+        or entry[1] != token
+        or (entry[2].done() and (entry[2].cancelled() or entry[2].exception()))
+    ):
+        from telegram import Bot
+
+        async def _init():
+            bot = Bot(token=token)
+            await bot.initialize()
+            return bot
+
+        old, entry = entry, (loop, token, loop.create_task(_init()))
+        _bot_entry = entry
+        if old is not None and old[0] is loop:
+            await _shutdown_bot(old[2])
+        # An entry from another (finished) loop can't be shut down from here;
+        # its pool died with that loop.
+    return await entry[2]
+
+
+async def _shutdown_bot(init_task: asyncio.Task):
+    try:
+        bot = await init_task
+        await bot.shutdown()
+    except Exception:
+        pass  # never initialized, or already unusable — nothing to release
+
+
+async def _close_bot():
+    """Shut down the shared Bot, if one was created on this loop."""
+    global _bot_entry
+    entry, _bot_entry = _bot_entry, None
+    if entry is None or entry[0] is not asyncio.get_running_loop():
+        return
+    await _shutdown_bot(entry[2])
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(server: FastMCP):
+    try:
+        yield
+    finally:
+        await _close_bot()
+        for log in _conversation_logs.values():
+            log.close()
+
+
+mcp = FastMCP("claude-tg", lifespan=_lifespan)
+
+# Bot API upload cap (50 MB); raise it when running against a local Bot API server
+MAX_UPLOAD_BYTES = int(os.environ.get("CLAUDE_TG_MAX_UPLOAD", 50 * 1024 * 1024))
+
+
+_conversation_logs: dict[str, ConversationLog] = {}
+
+
+def _conversation_log(work_dir: str) -> ConversationLog:
+    """One log per work dir for the server's lifetime, so its read cache is reused."""
+    log = _conversation_logs.get(work_dir)
+    if log is None:
+        log = _conversation_logs[work_dir] = ConversationLog(work_dir)
+    return log
 
 
 @mcp.tool()
@@ -26,42 +105,52 @@ async def send_telegram_file(file_path: str, caption: str = "", temp_file: bool
         return "Error: TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set"
 
     path = Path(file_path)
-    if not path.is_file():
+    try:
+        st = path.stat()
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         return f"Error: File not found: {file_path}"
-
-    from telegram import Bot
+    if st.st_size > MAX_UPLOAD_BYTES:
+        return (
+            f"Error: {path.name} is {st.st_size} bytes, over the "
+            f"{MAX_UPLOAD_BYTES}-byte Telegram upload limit"
+        )
 
     ext = path.suffix.lower()
-    bot = Bot(token=token)
-    async with bot:
-        with path.open("rb") as f:
-            if ext in {".ogg", ".oga", ".opus"}:
-                try:
-                    await bot.send_voice(
-                        chat_id=int(chat_id),
-                        voice=f,
-                        caption=caption or None,
-                    )
-                except Exception:
-                    f.seek(0)
-                    await bot.send_audio(
-                        chat_id=int(chat_id),
-                        audio=f,
-                        caption=caption or None,
-                    )
-            elif ext in {".mp3", ".m4a", ".aac", ".flac", ".wav"}:
-                await bot.send_audio(
-                    chat_id=int(chat_id),
-                    audio=f,
-                    caption=caption or None,
-                )
-            else:
-                await bot.send_document(
-                    chat_id=int(chat_id),
-                    document=f,
-                    filename=path.name,
-                    caption=caption or None,
-                )
+    bot = await _get_bot(token)
+    # Read off the event loop: python-telegram-bot would otherwise call the
+    # blocking f.read() itself while building the upload.
+    data = await asyncio.to_thread(path.read_bytes)
+    if ext in {".ogg", ".oga", ".opus"}:
+        try:
+            await bot.send_voice(
+                chat_id=int(chat_id),
+                voice=data,
+                filename=path.name,
+                caption=caption or None,
+            )
+        except Exception:
+            await bot.send_audio(
+                chat_id=int(chat_id),
+                audio=data,
+                filename=path.name,
+                caption=caption or None,
+            )
+    elif ext in {".mp3", ".m4a", ".aac", ".flac", ".wav"}:
+        await bot.send_audio(
+            chat_id=int(chat_id),
+            audio=data,
+            filename=path.name,
+            caption=caption or None,
+        )
+    else:
+        await bot.send_document(
+            chat_id=int(chat_id),
+            document=data,
+            filename=path.name,
+            caption=caption or None,
+        )
 
     if temp_file:
         path.unlink(missing_ok=True)
@@ -105,21 +194,18 @@ async def send_telegram_message(text: str, disable_preview: bool = True) -> str:
     if not text:
         return "Error: empty text"
 
-    from telegram import Bot
-
     parts = _chunk_text(text)
-    bot = Bot(token=token)
-    async with bot:
-        for part in parts:
-            await bot.send_message(
-                chat_id=int(chat_id),
-                text=part,
-                disable_web_page_preview=disable_preview,
-            )
+    bot = await _get_bot(token)
+    for part in parts:
+        await bot.send_message(
+            chat_id=int(chat_id),
+            text=part,
+            disable_web_page_preview=disable_preview,
+        )
     # Mirror the DIRECT path so get_conversation_context stays accurate.
     try:
         work_dir = os.environ.get("CLAUDE_WORK_DIR", os.getcwd())
-        ConversationLog(work_dir).log_direct(text)
+        _conversation_log(work_dir).log_direct(text)
     except Exception:
         pass
 
@@ -134,7 +220,7 @@ async def get_conversation_context(limit: int = 30, max_chars: int = 100000) ->
     and DIRECT alerts. Use this to understand the full dialog context.
     """
     work_dir = os.environ.get("CLAUDE_WORK_DIR", os.getcwd())
-    log = ConversationLog(work_dir)
+    log = _conversation_log(work_dir)
     context = log.format_context(limit=limit, max_chars=max_chars)
     return context or "(no conversation history yet)"
 
@@ -147,7 +233,7 @@ async def list_recent_uploads(limit: int = 20) -> str:
     the local upload was wiped (e.g. by session cleanup or restart).
     """
     work_dir = os.environ.get("CLAUDE_WORK_DIR", os.getcwd())
-    log = ConversationLog(work_dir)
+    log = _conversation_log(work_dir)
     entries = log.get_recent(limit=400, max_chars=400000)
     by_id: dict[str, str] = {}  # file_id → строка (дедуп: приём + флаш пишут один файл)
     for e in entries:
@@ -176,19 +262,17 @@ async def redownload_telegram_file(file_id: str, filename: str | None = None) ->
     if not token:
         return "Error: TELEGRAM_BOT_TOKEN must be set"
 
-    from telegram import Bot
     from .media import MediaHandler
 
     media = MediaHandler()
-    bot = Bot(token=token)
     try:
-        async with bot:
-            tg_file = await bot.get_file(file_id)
-            target_name = filename or (
-                Path(tg_file.file_path).name if tg_file.file_path else f"file_{file_id[:12]}"
-            )
-            local_path = os.path.join(media.upload_dir, target_name)
-            await tg_file.download_to_drive(local_path)
+        bot = await _get_bot(token)
+        tg_file = await bot.get_file(file_id)
+        target_name = filename or (
+            Path(tg_file.file_path).name if tg_file.file_path else f"file_{file_id[:12]}"
+        )
+        local_path = media.local_path(target_name)
+        await tg_file.download_to_drive(local_path)
         return f"Downloaded to {local_path}"
     except Exception as e:
         return f"Error: {e}"
@@ -234,19 +318,17 @@ async def ask_user_with_buttons(
     # Build message: full option text lives in the BODY (never truncated by Telegram),
     # buttons are compact numbers so long labels stay fully readable. (fix 2026-06-28:
     # inline-button labels were cut to ~30 chars / 2-per-row → user couldn't read them.)
-    from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
     from .askq_ui import build_ask_text, build_ask_keyboard
 
     text = build_ask_text(question, options, [], multi_select)
     keyboard = build_ask_keyboard(qid, options, [], multi_select)
 
-    bot = Bot(token=token)
-    async with bot:
-        await bot.send_message(
-            chat_id=int(chat_id),
-            text=text,
-            reply_markup=keyboard,
-        )
+    bot = await _get_bot(token)
+    await bot.send_message(
+        chat_id=int(chat_id),
+        text=text,
+        reply_markup=keyboard,
+    )
 
     # Poll for answer
     elapsed = 0
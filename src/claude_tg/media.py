@@ -4,13 +4,20 @@ import time
 import asyncio
 import logging
 import tempfile
-from pathlib import Path
 
 from telegram import PhotoSize, Document, Voice
 
 logger = logging.getLogger(__name__)
 
-_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
+_IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"})
+
+
+def _ext(file_path: str) -> str:
+    """Extension of the last path component ("" if none), like PurePath.suffix."""
+    i = file_path.rfind(".")
+    if i <= file_path.rfind("/") + 1 or i == len(file_path) - 1:
+        return ""
+    return file_path[i:]
 
 
 class MediaHandler:
@@ -21,8 +28,14 @@ class MediaHandler:
             tempfile.gettempdir(), "claude-tg-uploads"
         )
         os.makedirs(self.upload_dir, exist_ok=True)
-        self._files: list[str] = []
+        self._prefix = os.path.join(self.upload_dir, "")  # upload_dir + separator
+        self._files: set[str] = set()  # tracked local paths (retries may repeat one)
         self._meta: dict[str, dict] = {}  # local_path → {file_id, filename, kind}
+        self._groq = None  # (api_key, Groq client), created on first transcription
+
+    def local_path(self, filename: str) -> str:
+        """Path for `filename` inside the upload dir."""
+        return self._prefix + filename
 
     def get_meta(self, local_path: str) -> dict | None:
         return self._meta.get(local_path)
@@ -43,10 +56,12 @@ class MediaHandler:
     async def save_photo(self, photo: PhotoSize, bot) -> str:
         """Download a photo and return local path."""
         file = await self._get_file(photo.file_id, bot)
-        ext = Path(file.file_path).suffix if file.file_path else ".jpg"
-        local_path = os.path.join(self.upload_dir, f"photo_{photo.file_unique_id}{ext}")
+        ext = _ext(file.file_path).lower() if file.file_path else ".jpg"
+        if ext not in _IMAGE_EXTENSIONS:
+            ext = ".jpg"
+        local_path = self.local_path(f"photo_{photo.file_unique_id}{ext}")
         await file.download_to_drive(local_path)
-        self._files.append(local_path)
+        self._files.add(local_path)
         self._meta[local_path] = {
             "file_id": photo.file_id,
             "filename": os.path.basename(local_path),
@@ -59,9 +74,9 @@ class MediaHandler:
         """Download a document and return local path."""
         file = await self._get_file(doc.file_id, bot)
         filename = doc.file_name or f"file_{doc.file_unique_id}"
-        local_path = os.path.join(self.upload_dir, filename)
+        local_path = self.local_path(filename)
         await file.download_to_drive(local_path)
-        self._files.append(local_path)
+        self._files.add(local_path)
         self._meta[local_path] = {
             "file_id": doc.file_id,
             "filename": filename,
@@ -77,16 +92,16 @@ class MediaHandler:
         original filename when present so downstream tools (music-library skill)
         get a sane name and extension."""
         file = await self._get_file(audio.file_id, bot)
-        ext = Path(file.file_path).suffix if file.file_path else ""
+        ext = _ext(file.file_path) if file.file_path else ""
         if audio.file_name:
             filename = audio.file_name
         else:
             stem_parts = [p for p in (audio.performer, audio.title) if p]
             stem = " - ".join(stem_parts) if stem_parts else f"audio_{audio.file_unique_id}"
             filename = f"{stem}{ext or '.mp3'}"
-        local_path = os.path.join(self.upload_dir, filename)
+        local_path = self.local_path(filename)
         await file.download_to_drive(local_path)
-        self._files.append(local_path)
+        self._files.add(local_path)
         self._meta[local_path] = {
             "file_id": audio.file_id,
             "filename": filename,
@@ -98,9 +113,9 @@ class MediaHandler:
     async def save_voice(self, voice: Voice, bot) -> str:
         """Download a voice message and return local path."""
         file = await self._get_file(voice.file_id, bot)
-        local_path = os.path.join(self.upload_dir, f"voice_{voice.file_unique_id}.ogg")
+        local_path = self.local_path(f"voice_{voice.file_unique_id}.ogg")
         await file.download_to_drive(local_path)
-        self._files.append(local_path)
+        self._files.add(local_path)
         self._meta[local_path] = {
             "file_id": voice.file_id,
             "filename": os.path.basename(local_path),
@@ -112,9 +127,9 @@ class MediaHandler:
     async def redownload(self, file_id: str, filename: str, bot) -> str:
         """Re-download a file by its Telegram file_id (for recovering wiped uploads)."""
         file = await self._get_file(file_id, bot)
-        local_path = os.path.join(self.upload_dir, filename)
+        local_path = self.local_path(filename)
         await file.download_to_drive(local_path)
-        self._files.append(local_path)
+        self._files.add(local_path)
         self._meta[local_path] = {
             "file_id": file_id,
             "filename": filename,
@@ -125,26 +140,33 @@ class MediaHandler:
 
     async def transcribe_voice(self, ogg_path: str, api_key: str) -> str:
         """Transcribe voice message using Groq Whisper API."""
-        from groq import Groq
-
-        client = Groq(api_key=api_key)
-        with open(ogg_path, "rb") as f:
-            transcription = client.audio.transcriptions.create(
-                file=(os.path.basename(ogg_path), f),
+        if self._groq is None or self._groq[0] != api_key:
+            from groq import Groq
+
+            # One client per key: keeps its HTTP pool alive across messages
+            self._groq = (api_key, Groq(api_key=api_key))
+        client = self._groq[1]
+
+        def _transcribe() -> str:
+            with open(ogg_path, "rb") as f:
+                data = f.read()
+            return client.audio.transcriptions.create(
+                file=(os.path.basename(ogg_path), data),
                 model="whisper-large-v3",
-            )
-        return transcription.text
+            ).text
+
+        # The Groq SDK is synchronous; keep the event loop free meanwhile
+        return await asyncio.to_thread(_transcribe)
 
     def build_prompt(self, text: str, photo_paths: list[str], doc_paths: list[str]) -> str:
         """Build a prompt that includes references to uploaded files."""
-        parts = []
-        for path in photo_paths:
-            parts.append(f"[User sent a photo: {path}]")
-        for path in doc_paths:
-            parts.append(f"[User sent a file: {path}]")
+        if not photo_paths and not doc_paths:
+            return text
+        parts = [f"[User sent a photo: {path}]" for path in photo_paths]
+        parts.extend(f"[User sent a file: {path}]" for path in doc_paths)
         if text:
             parts.append(text)
-        return "\n".join(parts) if parts else text
+        return "\n".join(parts)
 
     def cleanup(self, keep: list[str] | None = None):
         """Remove tracked files except those in `keep`.
@@ -153,17 +175,13 @@ class MediaHandler:
         wiping a file that was just downloaded for a turn that's about to start.
         """
         keep_set = set(keep or [])
-        survivors: list[str] = []
-        for path in self._files:
-            if path in keep_set:
-                survivors.append(path)
-                continue
+        for path in self._files - keep_set:
             try:
                 os.remove(path)
                 logger.debug(f"Cleaned up: {path}")
             except OSError:
                 pass
-        self._files = survivors
+        self._files &= keep_set
 
     def cleanup_all(self, max_age_seconds: int = 86400):
         """Remove tracked files and stale files in upload dir.
@@ -175,7 +193,7 @@ class MediaHandler:
         # Wipe tracked files unconditionally except recent ones
         keep_recent: list[str] = []
         cutoff = time.time() - max_age_seconds
-        for path in list(self._files):
+        for path in self._files:
             try:
                 if os.path.getmtime(path) > cutoff:
                     keep_recent.append(path)
@@ -187,13 +205,13 @@ class MediaHandler:
         # Also wipe stray files in upload dir (not tracked by this instance),
         # but only if older than cutoff.
         try:
-            for f in os.listdir(self.upload_dir):
-                fp = os.path.join(self.upload_dir, f)
-                try:
-                    if os.path.getmtime(fp) <= cutoff:
-                        os.remove(fp)
-                        logger.debug(f"Cleaned up stale: {fp}")
-                except OSError:
-                    pass
+            with os.scandir(self.upload_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file() and entry.stat().st_mtime <= cutoff:
+                            os.unlink(entry.path)
+                            logger.debug(f"Cleaned up stale: {entry.path}")
+                    except OSError:
+                        pass
         except OSError:
             pass
@@ -1,17 +1,30 @@
 """Claude Code CLI subprocess manager with persistent streaming process."""
 import asyncio
+import functools
 import json
 import logging
 import os
 import signal
-from dataclasses import dataclass, field
-from enum import Enum, auto
+import sys
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import IntEnum, auto
 from typing import AsyncIterator
 
+from . import fastjson
+
 logger = logging.getLogger(__name__)
 
+# Tool names and session ids come from a tiny vocabulary; interning them
+# makes repeated values share one object (and one cached hash).
+_intern = sys.intern
+
 
-class EventType(Enum):
+class EventType(IntEnum):
+    # IntEnum: members hash and compare as plain ints (C-level) in the
+    # per-event type checks and _SESSION_BEARING lookups.
     INIT = auto()
     TEXT_DELTA = auto()
     TOOL_START = auto()
@@ -20,12 +33,16 @@ class EventType(Enum):
     RESULT = auto()
 
 
-@dataclass
+# Events whose session_id updates ClaudeRunner.session_id
+_SESSION_BEARING = frozenset({EventType.INIT, EventType.RESULT})
+
+
+@dataclass(slots=True)
 class RunnerEvent:
     type: EventType
     text: str = ""
     tool_name: str = ""
-    tool_input: dict = field(default_factory=dict)
+    tool_input: dict | None = None  # set on TOOL_USE only; no dict per text delta
     tool_id: str = ""
     is_error: bool = False
     session_id: str = ""
@@ -38,69 +55,114 @@ class RunnerEvent:
 # Queue sentinel types — signal EOF or errors from the background reader.
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class _EOF:
     """Process stdout closed."""
     stderr: str = ""
     returncode: int = 0
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class _Error:
     """Background reader crashed."""
     message: str = ""
 
 
+@functools.cache
+def _cpu_split() -> tuple[set[int], set[int]] | None:
+    """Split our allowed CPUs into ({0}, the rest) for CLAUDE_TG_ISOLATE_CPU.
+
+    None (isolation is a no-op) without sched_*affinity, when CPU 0 is not in
+    the allowed set (cpuset/container), or when nothing would be left for the CLI.
+    Cached: it must see the mask we started with, not the loop thread's {0}.
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    allowed = os.sched_getaffinity(0)
+    rest = allowed - {0}
+    if 0 not in allowed or not rest:
+        return None
+    return {0}, rest
+
+
+def _set_thread_affinity(tid: int, cpus: set[int]):
+    try:
+        os.sched_setaffinity(tid, cpus)
+    except OSError as e:
+        logger.warning("Could not set CPU affinity for tid=%s: %s", tid, e)
+
+
+# Loops whose default executor already widens its workers (see _pin_loop_thread)
+_widened_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+
+def _pin_loop_thread(split: tuple[set[int], set[int]]):
+    """Pin the calling event-loop thread to split[0].
+
+    Threads inherit their creator's mask and the loop thread spawns the
+    to_thread() workers, so the loop gets a default executor whose workers
+    reset themselves to every allowed CPU instead of queueing on CPU 0.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _widened_loops:
+        _widened_loops.add(loop)
+        loop.set_default_executor(ThreadPoolExecutor(
+            initializer=_set_thread_affinity, initargs=(0, split[0] | split[1]),
+        ))
+    _set_thread_affinity(0, split[0])
+
+
 class StreamParser:
     """Parse NDJSON stream events from Claude Code CLI."""
 
     def __init__(self):
         self._last_turn_input: int = 0  # Track last turn's input tokens
         self._context_window: int = 200_000  # Updated from modelUsage when available
+        # TOOL_START carries nothing but the tool name, so one shared event per
+        # name is reused (consumers never mutate events).
+        self._tool_start_cache: dict[str, RunnerEvent] = {}
 
     def parse(self, data: dict) -> RunnerEvent | None:
         event_type = data.get("type")
-
-        if event_type == "system":
-            return self._parse_system(data)
-        elif event_type == "stream_event":
-            return self._parse_stream_event(data)
-        elif event_type == "assistant":
-            return self._parse_assistant(data)
-        elif event_type == "user":
-            return self._parse_user(data)
-        elif event_type == "result":
-            return self._parse_result(data)
-        return None
+        if event_type == "stream_event":
+            # Hot path (one line per token): each nesting level is looked up
+            # once, and token deltas skip the method dispatch entirely. Plain
+            # subscripts under try (zero-cost on 3.11+) avoid building a `{}`
+            # default per line; malformed shapes are the cold path.
+            try:
+                inner = data["event"]
+                inner_type = inner["type"]
+                if inner_type == "content_block_delta":
+                    delta = inner["delta"]
+                    if delta["type"] == "text_delta":
+                        return RunnerEvent(type=EventType.TEXT_DELTA, text=delta.get("text", ""))
+                    return None
+            except (KeyError, TypeError):
+                return None
+            handler = self._STREAM_DISPATCH.get(inner_type)
+            return handler(self, inner) if handler else None
+        handler = self._DISPATCH.get(event_type)
+        return handler(self, data) if handler else None
 
     def _parse_system(self, data: dict) -> RunnerEvent | None:
         if data.get("subtype") == "init":
             return RunnerEvent(
                 type=EventType.INIT,
-                session_id=data.get("session_id", ""),
+                session_id=_intern(data.get("session_id", "")),
             )
         return None
 
-    def _parse_stream_event(self, data: dict) -> RunnerEvent | None:
-        inner = data.get("event", {})
-        inner_type = inner.get("type")
-
-        if inner_type == "content_block_delta":
-            delta = inner.get("delta", {})
-            if delta.get("type") == "text_delta":
-                return RunnerEvent(
-                    type=EventType.TEXT_DELTA,
-                    text=delta.get("text", ""),
-                )
-
-        elif inner_type == "content_block_start":
-            block = inner.get("content_block", {})
-            if block.get("type") == "tool_use":
-                return RunnerEvent(
+    def _parse_block_start(self, inner: dict) -> RunnerEvent | None:
+        block = inner.get("content_block", {})
+        if block.get("type") == "tool_use":
+            name = block.get("name", "")
+            event = self._tool_start_cache.get(name)
+            if event is None:
+                event = self._tool_start_cache[name] = RunnerEvent(
                     type=EventType.TOOL_START,
-                    tool_name=block.get("name", ""),
+                    tool_name=_intern(name),
                 )
-
+            return event
         return None
 
     def _parse_assistant(self, data: dict) -> RunnerEvent | None:
@@ -120,7 +182,7 @@ class StreamParser:
             if block.get("type") == "tool_use":
                 return RunnerEvent(
                     type=EventType.TOOL_USE,
-                    tool_name=block.get("name", ""),
+                    tool_name=_intern(block.get("name", "")),
                     tool_input=block.get("input", {}),
                     tool_id=block.get("id", ""),
                 )
@@ -194,7 +256,7 @@ class StreamParser:
 
         return RunnerEvent(
             type=EventType.RESULT,
-            session_id=data.get("session_id", ""),
+            session_id=_intern(data.get("session_id", "")),
             duration_ms=data.get("duration_ms", 0),
             num_turns=data.get("num_turns", 0),
             cost_usd=data.get("total_cost_usd", 0.0),
@@ -202,32 +264,82 @@ class StreamParser:
             context_pct=used_pct,
         )
 
+    # Top-level "type" → unbound parser; one hash lookup per NDJSON line.
+    # stream_event is handled inline in parse().
+    _DISPATCH = {
+        "system": _parse_system,
+        "assistant": _parse_assistant,
+        "user": _parse_user,
+        "result": _parse_result,
+    }
+    _STREAM_DISPATCH = {
+        "content_block_start": _parse_block_start,
+    }
 
-_BUILTIN_TOOLS = [
+
+_BUILTIN_TOOLS = tuple(map(_intern, (
     "Bash()", "Edit()", "MultiEdit()", "Write()", "Read()",
     "Glob()", "Grep()", "WebFetch()", "WebSearch()",
     "Task()", "TodoWrite()", "NotebookEdit()", "NotebookRead()",
-]
+)))
+
+# config path -> (st_mtime_ns, server names); ~/.claude.json can be megabytes
+_mcp_cache: dict[str, tuple[int, frozenset[str]]] = {}
+
+
+def _mcp_servers_in(path: str) -> frozenset[str]:
+    """MCP server names registered in one config file, cached on mtime."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return frozenset()
+    cached = _mcp_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, "rb") as f:
+            data = fastjson.loads(f.read())
+        names = frozenset(f"mcp__{name}" for name in data.get("mcpServers", {}))
+    except (fastjson.JSONDecodeError, UnicodeDecodeError, OSError):
+        names = frozenset()
+    _mcp_cache[path] = (mtime, names)
+    return names
 
 
 def _discover_mcp_servers(work_dir: str) -> list[str]:
     """Read registered MCP server names from Claude config files."""
-    from pathlib import Path
-
-    servers = set()
-    for path in [
-        Path.home() / ".claude.json",
-        Path(work_dir) / ".mcp.json",
-    ]:
-        if path.is_file():
-            try:
-                with open(path) as f:
-                    data = json.load(f)
-                for name in data.get("mcpServers", {}):
-                    servers.add(f"mcp__{name}")
-            except (json.JSONDecodeError, OSError):
-                pass
-    return sorted(servers)
+    home_cfg = os.path.join(os.path.expanduser("~"), ".claude.json")
+    project_cfg = os.path.join(work_dir, ".mcp.json")
+    return sorted(_mcp_servers_in(home_cfg) | _mcp_servers_in(project_cfg))
+
+
+_EVENT_QUEUE_SIZE = 10_000
+_OVERFLOW_MAX = 1_000_000  # chars of text buffered past a full queue before shedding
+_READ_CHUNK = 64 * 1024
+_READ_STDERR = 4096
+_PARSE_INLINE_MAX = 64 * 1024  # longer NDJSON lines are parsed in a worker thread
+_STREAM_LIMIT = 4 * 1024 * 1024
+_MAX_RECORD = 100 * 1024 * 1024  # a single NDJSON line larger than this is dropped
+_STDERR_TAIL_CHUNKS = 8  # keep at most 32 KB of stderr for error reports
+
+# NDJSON user-message envelope; _send_stdin writes the JSON-encoded text between
+_STDIN_PREFIX = b'{"type":"user","message":{"role":"user","content":'
+_STDIN_SUFFIX = b'}}\n'
+
+# Fixed part of every CLI invocation; per-session flags are appended to a copy.
+_BASE_CMD = (
+    "claude",
+    "-p",
+    "--output-format", "stream-json",
+    "--input-format", "stream-json",
+    "--verbose",
+    "--include-partial-messages",
+    # Seamless: всегда пропускаем пермишены — интерактивные промпты в Telegram
+    # некуда нажать (ловушка). Под root Claude Code блокирует
+    # --dangerously-skip-permissions, но IS_SANDBOX=1 снимает блокировку
+    # (env выставляется при запуске процесса).
+    "--dangerously-skip-permissions",
+)
 
 
 class ClaudeRunner:
@@ -242,7 +354,7 @@ class ClaudeRunner:
     """
 
     def __init__(self, work_dir: str, model: str | None = None, max_budget: float | None = None,
-                 effort: str | None = None, ultracode: bool = False):
+                 effort: str | None = None, ultracode: bool = False, isolate_cpu: bool = False):
         self.work_dir = work_dir
         self.model = model
         self.max_budget = max_budget
@@ -250,12 +362,29 @@ class ClaudeRunner:
         # ultracode is not an --effort value (that flag rejects it); it's a
         # session settings key. Enabling it = xhigh effort + dynamic workflows.
         self.ultracode = ultracode
+        # (bot CPUs, CLI CPUs) when isolating: the bot keeps CPU 0, the CLI
+        # gets the rest of the allowed set. Taken now, before we pin ourselves.
+        self._cpu_split = _cpu_split() if isolate_cpu else None
         self.session_id: str | None = None
         self.process: asyncio.subprocess.Process | None = None
         self.is_processing = False
         self._parser = StreamParser()
-        self._event_queue: asyncio.Queue[RunnerEvent | _EOF | _Error] = asyncio.Queue()
+        self._event_queue: asyncio.Queue[RunnerEvent | _EOF | _Error] = asyncio.Queue(
+            maxsize=_EVENT_QUEUE_SIZE
+        )
+        # Text that arrived while the queue was full. Always newer than
+        # everything queued; flushed ahead of the next non-delta item, or read
+        # directly by the consumer once the queue runs dry.
+        self._overflow: list[str] = []
+        self._overflow_len = 0
+        self._overflow_dropped = 0  # chars shed past _OVERFLOW_MAX, reported in-band
+        self.dropped_deltas = 0  # TEXT_DELTAs shed because nobody was consuming
+        # One item read ahead of a run of deltas; it is next in stream order,
+        # so every read checks it before the queue.
+        self._pushback: RunnerEvent | _EOF | _Error | None = None
         self._reader_task: asyncio.Task | None = None
+        self._stderr_task: asyncio.Task | None = None
+        self._stderr_tail: deque[bytes] = deque(maxlen=_STDERR_TAIL_CHUNKS)
 
     @property
     def process_alive(self) -> bool:
@@ -270,36 +399,13 @@ class ClaudeRunner:
         if self.process_alive:
             return
 
-        # Clean up old reader task
-        if self._reader_task and not self._reader_task.done():
-            self._reader_task.cancel()
-            try:
-                await self._reader_task
-            except asyncio.CancelledError:
-                pass
-            self._reader_task = None
+        # Clean up old reader tasks
+        await self._cleanup_reader()
 
         # Clear stale queue items from previous process
-        while not self._event_queue.empty():
-            try:
-                self._event_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
+        self._take_all_events()
 
-        cmd = [
-            "claude",
-            "-p",
-            "--output-format", "stream-json",
-            "--input-format", "stream-json",
-            "--verbose",
-            "--include-partial-messages",
-        ]
-
-        # Seamless: всегда пропускаем пермишены — интерактивные промпты в Telegram
-        # некуда нажать (ловушка). Под root Claude Code блокирует
-        # --dangerously-skip-permissions, но IS_SANDBOX=1 снимает блокировку
-        # (env выставляется ниже при запуске процесса).
-        cmd.append("--dangerously-skip-permissions")
+        cmd = list(_BASE_CMD)
 
         if self.session_id:
             cmd.extend(["--resume", self.session_id])
@@ -316,18 +422,34 @@ class ClaudeRunner:
 
         # IS_SANDBOX=1 разрешает --dangerously-skip-permissions под root.
         proc_env = {**os.environ, "IS_SANDBOX": "1"}
-        self.process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=self.work_dir,
-            env=proc_env,
-            limit=100 * 1024 * 1024,  # 100MB
-        )
+        split = self._cpu_split
+        if split:
+            # The child is forked from this thread and inherits its mask
+            # through exec, so every CLI thread and tool process gets it.
+            _set_thread_affinity(0, split[1])
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.work_dir,
+                env=proc_env,
+                # StreamReader pauses the pipe once ~2x limit is buffered; keep that
+                # low for backpressure (we never use readline(), so lines may exceed it).
+                limit=_STREAM_LIMIT,
+            )
+        finally:
+            if split:
+                _pin_loop_thread(split)
         logger.info("Started Claude process pid=%s", self.process.pid)
 
-        # Start background stdout reader
+        # Start background readers; stderr is drained concurrently so a chatty
+        # CLI can't fill that pipe and stall, and only its tail is kept.
+        self._stderr_tail.clear()
+        self._stderr_task = asyncio.create_task(
+            self._stderr_reader(), name=f"stderr-reader-{self.process.pid}"
+        )
         self._reader_task = asyncio.create_task(
             self._stdout_reader(), name=f"stdout-reader-{self.process.pid}"
         )
@@ -337,77 +459,216 @@ class ClaudeRunner:
         if not self.process_alive or not self.process.stdin:
             raise RuntimeError("Process not alive")
 
-        msg = json.dumps({
-            "type": "user",
-            "message": {"role": "user", "content": text}
-        }, ensure_ascii=False) + "\n"
-
-        self.process.stdin.write(msg.encode())
+        # Only the content varies; the envelope around it is pre-encoded.
+        self.process.stdin.writelines((_STDIN_PREFIX, fastjson.dumps(text), _STDIN_SUFFIX))
         await self.process.stdin.drain()
 
+    async def _put_event(self, item: RunnerEvent | _EOF | _Error):
+        """Queue an item; when full, buffer text deltas instead of growing the queue.
+
+        Text past _OVERFLOW_MAX is shed and the gap is reported in-band. Other
+        items flush that buffer first and then wait for space — backpressure
+        through the stdout pipe is preferable to losing a structural event.
+        """
+        queue = self._event_queue
+        is_delta = isinstance(item, RunnerEvent) and item.type == EventType.TEXT_DELTA
+        if self._overflow_pending:
+            if is_delta and queue.full():
+                self._buffer_overflow(item.text)
+                return
+            await queue.put(self._take_overflow())  # keeps order; no wait unless full
+        try:
+            queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+        if is_delta:
+            self._buffer_overflow(item.text)
+        else:
+            await queue.put(item)
+
+    @property
+    def _overflow_pending(self) -> bool:
+        return bool(self._overflow) or self._overflow_dropped > 0
+
+    def _buffer_overflow(self, text: str):
+        if self._overflow_len + len(text) <= _OVERFLOW_MAX:
+            self._overflow.append(text)
+            self._overflow_len += len(text)
+            return
+        self._overflow_dropped += len(text)
+        self.dropped_deltas += 1
+        if self.dropped_deltas % 1000 == 1:
+            logger.warning("Event queue full, dropped %d text deltas so far", self.dropped_deltas)
+
+    def _take_overflow(self) -> RunnerEvent:
+        """Turn the overflow buffer into one TEXT_DELTA, marking any shed text."""
+        text = "".join(self._overflow)
+        if self._overflow_dropped:
+            text += f"\n⚠️ [{self._overflow_dropped} chars of output lost: reader fell behind]\n"
+        self._overflow.clear()
+        self._overflow_len = self._overflow_dropped = 0
+        return RunnerEvent(type=EventType.TEXT_DELTA, text=text)
+
+    def _get_nowait(self) -> RunnerEvent | _EOF | _Error:
+        """Next item in stream order: pushback, the queue, then the overflow buffer."""
+        item = self._pushback
+        if item is not None:
+            self._pushback = None
+            return item
+        try:
+            return self._event_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            if self._overflow_pending:
+                return self._take_overflow()
+            raise
+
+    def _take_all_events(self) -> list:
+        """Remove and return every pending item (queue, then overflow)."""
+        items = []
+        while True:
+            try:
+                items.append(self._get_nowait())
+            except asyncio.QueueEmpty:
+                return items
+
     async def _stdout_reader(self):
         """Background task: continuously read stdout into _event_queue.
 
         Runs for the entire lifetime of the subprocess. Ensures the pipe
-        is always being drained, preventing buffer-full deadlocks.
+        is always being drained, preventing buffer-full deadlocks. Reads in
+        64 KB chunks and splits lines locally — one await per chunk rather
+        than one per NDJSON line.
         """
+        buf = bytearray()
+        skipping = False  # inside an oversized record being discarded
         try:
             while True:
-                line = await self.process.stdout.readline()
-                if not line:  # EOF — process exited
+                chunk = await self.process.stdout.read(_READ_CHUNK)
+                if not chunk:  # EOF — process exited
+                    if buf and not skipping:
+                        await self._handle_lines([buf])
                     await self.process.wait()
-                    stderr_text = ""
-                    # Always read stderr — CLI may write errors even with rc=0
-                    try:
-                        stderr_bytes = await self.process.stderr.read()
-                        stderr_text = stderr_bytes.decode().strip()[:2000] if stderr_bytes else ""
-                    except Exception:
-                        pass
-                    await self._event_queue.put(
+                    # Always report stderr — CLI may write errors even with rc=0
+                    if self._stderr_task:
+                        try:
+                            await self._stderr_task
+                        except Exception:
+                            pass
+                    stderr_text = b"".join(self._stderr_tail).decode(errors="replace").strip()[-2000:]
+                    await self._put_event(
                         _EOF(stderr=stderr_text, returncode=self.process.returncode or 0)
                     )
                     return
 
-                line_str = line.decode().strip()
-                if not line_str:
+                buf += chunk
+                # Only the new chunk can complete a line
+                if b"\n" not in chunk:
+                    if len(buf) > _MAX_RECORD:
+                        # Runaway line: drop it rather than buffer without bound
+                        if not skipping:
+                            logger.warning("Dropping oversized stdout record (>%d bytes)", _MAX_RECORD)
+                            await self._put_event(RunnerEvent(
+                                type=EventType.TEXT_DELTA,
+                                text="\n⚠️ Oversized output record dropped\n",
+                            ))
+                            skipping = True
+                        buf.clear()
                     continue
-
-                try:
-                    data = json.loads(line_str)
-                    event = self._parser.parse(data)
-                    if event:
-                        if event.type == EventType.TOOL_USE:
-                            logger.info("Tool call: %s(%s)", event.tool_name, json.dumps(event.tool_input, ensure_ascii=False)[:200])
-                        elif event.type == EventType.TOOL_RESULT:
-                            status = "error" if event.is_error else "ok"
-                            logger.info("Tool result: %s (%s, %d chars)", event.tool_name, status, len(event.text))
-                        if event.session_id and event.type in (EventType.INIT, EventType.RESULT):
-                            self.session_id = event.session_id
-                        await self._event_queue.put(event)
-                except json.JSONDecodeError:
-                    await self._event_queue.put(
-                        RunnerEvent(type=EventType.TEXT_DELTA, text=line_str)
-                    )
+                # One split copies each record once; the unterminated tail
+                # becomes the new buffer (no slice, no front-deletion memmove).
+                lines = buf.split(b"\n")
+                buf = lines.pop()
+                if skipping:
+                    del lines[0]  # remainder of the dropped record
+                    skipping = False
+                await self._handle_lines(lines)
         except asyncio.CancelledError:
             return
         except Exception as e:
             logger.error("Background reader crashed: %s", e)
-            await self._event_queue.put(_Error(message=str(e)))
+            await self._put_event(_Error(message=str(e)))
+
+    async def _stderr_reader(self):
+        """Background task: drain stderr, keeping only the last few chunks."""
+        try:
+            while chunk := await self.process.stderr.read(_READ_STDERR):
+                self._stderr_tail.append(chunk)
+        except asyncio.CancelledError:
+            return
+
+    async def _handle_lines(self, lines: list[bytes | bytearray]):
+        """Parse a batch of NDJSON lines read together and queue their events.
+
+        Adjacent text deltas within the batch are merged into one TEXT_DELTA
+        (flushed before any other event), so a token-per-line stream costs one
+        queue round-trip per read chunk rather than one per token. Nothing is
+        held back past the batch, so latency is unchanged.
+        """
+        deltas: list[str] = []
+        for line in lines:
+            if len(line) > _PARSE_INLINE_MAX:
+                # Big tool results: parse off-loop. Only this reader task uses
+                # the parser and it awaits the thread, so state stays serial.
+                event = await asyncio.to_thread(self._parse_line, line)
+            else:
+                event = self._parse_line(line)
+            if event is None:
+                continue
+            if event.type == EventType.TEXT_DELTA:
+                deltas.append(event.text)
+                continue
+            if deltas:
+                await self._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="".join(deltas)))
+                deltas = []
+            await self._put_event(event)
+        if deltas:
+            await self._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="".join(deltas)))
+
+    def _parse_line(self, line: bytes | bytearray) -> RunnerEvent | None:
+        """Turn one NDJSON stdout line into an event (non-JSON becomes text)."""
+        line = line.strip()
+        if not line:
+            return None
+
+        try:
+            data = fastjson.loads(line)
+        except (fastjson.JSONDecodeError, UnicodeDecodeError):
+            return RunnerEvent(type=EventType.TEXT_DELTA, text=line.decode(errors="replace"))
+        event = self._parser.parse(data)
+        if event:
+            if event.type == EventType.TOOL_USE:
+                logger.info("Tool call: %s(%s)", event.tool_name, json.dumps(event.tool_input, ensure_ascii=False)[:200])
+            elif event.type == EventType.TOOL_RESULT:
+                status = "error" if event.is_error else "ok"
+                logger.info("Tool result: %s (%s, %d chars)", event.tool_name, status, len(event.text))
+            if event.type in _SESSION_BEARING and event.session_id:
+                self.session_id = event.session_id
+        return event
 
     async def _read_until_result(self) -> AsyncIterator[RunnerEvent]:
-        """Yield events from the queue until RESULT or EOF/error sentinel."""
+        """Yield events from the queue until RESULT or EOF/error sentinel.
+
+        Text deltas that piled up while the consumer was busy (e.g. awaiting a
+        Telegram edit) are yielded as one merged TEXT_DELTA.
+        """
         while True:
+            # Fast path: during a burst the queue is non-empty, so no timer
+            # (or wait_for wrapper) is set up per event.
             try:
-                item = await asyncio.wait_for(self._event_queue.get(), timeout=30)
-            except asyncio.TimeoutError:
-                if self.process_alive:
-                    continue  # Process running — tool may be blocking stdout
-                logger.error("Process dead and queue empty — ending turn")
-                yield RunnerEvent(
-                    type=EventType.TEXT_DELTA,
-                    text="\n❌ Process exited unexpectedly",
-                )
-                return
+                item = self._get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    item = await asyncio.wait_for(self._event_queue.get(), timeout=30)
+                except asyncio.TimeoutError:
+                    if self.process_alive:
+                        continue  # Process running — tool may be blocking stdout
+                    logger.error("Process dead and queue empty — ending turn")
+                    yield RunnerEvent(
+                        type=EventType.TEXT_DELTA,
+                        text="\n❌ Process exited unexpectedly",
+                    )
+                    return
 
             if isinstance(item, _EOF):
                 if item.stderr:
@@ -433,23 +694,37 @@ class ClaudeRunner:
                 )
                 return
 
+            if item.type == EventType.TEXT_DELTA:
+                texts = None
+                while True:
+                    try:
+                        nxt = self._get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if not isinstance(nxt, RunnerEvent) or nxt.type != EventType.TEXT_DELTA:
+                        self._pushback = nxt
+                        break
+                    if texts is None:
+                        texts = [item.text]
+                    texts.append(nxt.text)
+                if texts is not None:
+                    item = RunnerEvent(type=EventType.TEXT_DELTA, text="".join(texts))
+
             yield item
             if item.type == EventType.RESULT:
                 return
 
-    async def _drain_pending(self):
+    def _drain_pending(self):
         """Drain any pending events from the queue (non-blocking)."""
-        drained = 0
-        while not self._event_queue.empty():
-            try:
-                item = self._event_queue.get_nowait()
-                drained += 1
-                if isinstance(item, _EOF):
-                    # Don't lose EOF — put it back for _read_until_result
-                    await self._event_queue.put(item)
-                    break
-            except asyncio.QueueEmpty:
+        items = self._take_all_events()
+        for drained, item in enumerate(items, 1):
+            if isinstance(item, _EOF):
+                # Don't lose EOF — put it back for _read_until_result
+                # (the queue was just emptied, so this cannot overflow)
+                self._event_queue.put_nowait(item)
                 break
+        else:
+            drained = len(items)
         if drained:
             # Сюда попадать не должны: сиротские ходы забирает _watch_orphan_turns
             # в bot.py. Если видишь это в логе — события чьего-то хода потеряны.
@@ -457,7 +732,7 @@ class ClaudeRunner:
 
     def has_pending_events(self) -> bool:
         """Check if there are pending events in the queue (from mid-turn injections)."""
-        return not self._event_queue.empty()
+        return self._pushback is not None or not self._event_queue.empty() or self._overflow_pending
 
     async def read_pending_turn(self) -> AsyncIterator[RunnerEvent]:
         """Yield events from a pending turn (injected mid-turn). Reads until RESULT or empty."""
@@ -473,7 +748,7 @@ class ClaudeRunner:
         """
         try:
             await self._ensure_process()
-            await self._drain_pending()
+            self._drain_pending()
             await self._send_stdin(prompt)
             async for event in self._read_until_result():
                 yield event
@@ -502,14 +777,16 @@ class ClaudeRunner:
         logger.info("Injected mid-turn message (%d chars)", len(prompt))
 
     async def _cleanup_reader(self):
-        """Cancel and await the background reader task."""
-        if self._reader_task and not self._reader_task.done():
-            self._reader_task.cancel()
-            try:
-                await self._reader_task
-            except asyncio.CancelledError:
-                pass
+        """Cancel and await the background reader tasks."""
+        for task in (self._reader_task, self._stderr_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         self._reader_task = None
+        self._stderr_task = None
 
     async def cancel(self) -> None:
         """Kill the running process (hard stop)."""
@@ -1,7 +1,7 @@
 """Telegram message streaming with rate limiting and message chaining."""
-import time
 import asyncio
 import logging
+from collections import deque
 from telegram import Message, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.error import BadRequest
@@ -10,56 +10,94 @@ from .formatter import md_to_html
 
 logger = logging.getLogger(__name__)
 
+# BadRequest texts for which re-sending the edit without parse_mode can help.
+_PLAIN_RETRY_ERRORS = ("entities", "entity", "too long")
+
 
 class MessageChain:
     """Buffer text and manage splitting across Telegram messages."""
 
     def __init__(self, max_length: int = 3800):
         self.max_length = max_length
-        self._chunks: list[str] = []
-        self._current: str = ""
+        # Completed chunks are only kept for has-content checks; cap them so a
+        # long turn doesn't hold every sent message in memory.
+        self._chunks: deque[str] = deque(maxlen=16)
+        # Current buffer as a list of deltas, joined only when read, so each
+        # append costs O(len(delta)) instead of copying the whole buffer.
+        self._parts: list[str] = []
+        self._len = 0
         self._footer: str = ""
 
     @property
     def current_text(self) -> str:
-        return self._current
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    @current_text.setter
+    def current_text(self, text: str):
+        self._parts = [text] if text else []
+        self._len = len(text)
+
+    def __len__(self) -> int:
+        return self._len
 
     @property
     def needs_new_message(self) -> bool:
-        return len(self._current) > self.max_length
+        return self._len > self.max_length
+
+    def tail(self, n: int) -> str:
+        """Return the last `n` characters of the buffer without joining all of it."""
+        out, got = [], 0
+        for part in reversed(self._parts):
+            out.append(part)
+            got += len(part)
+            if got >= n:
+                break
+        return "".join(reversed(out))[-n:]
+
+    def prepend(self, text: str):
+        if text:
+            # list.insert(0) shifts only the part pointers (a few dozen at
+            # most), not the buffered text a concatenation would copy.
+            self._parts.insert(0, text)
+            self._len += len(text)
 
     def append_text(self, text: str):
-        self._current += text
+        if text:
+            self._parts.append(text)
+            self._len += len(text)
 
     def append_tool_call(self, line: str):
-        if self._current and not self._current.endswith("\n"):
-            self._current += "\n"
-        self._current += line + "\n"
+        if self._parts and not self._parts[-1].endswith("\n"):
+            self.append_text("\n")
+        self.append_text(line + "\n")
 
     def complete_current(self) -> str:
         """Finalize current buffer and start new one. Returns completed text."""
-        text = self._current
+        text = self.current_text
         if len(text) <= self.max_length:
             completed = text
-            self._current = ""
+            self.current_text = ""
         else:
-            split_at = text.rfind("\n", 0, self.max_length)
-            if split_at < self.max_length // 2:
+            # Only a newline in the second half is an acceptable split point.
+            split_at = text.rfind("\n", self.max_length // 2, self.max_length)
+            if split_at < 0:
                 split_at = self.max_length
             completed = text[:split_at]
-            self._current = text[split_at:].lstrip("\n")
+            self.current_text = text[split_at:].lstrip("\n")
         self._chunks.append(completed)
         return completed
 
     def set_footer(self, footer: str):
-        self._footer = footer
+        # Stored with its separator so render() only has to concatenate.
+        self._footer = "\n\n" + footer if footer else ""
 
     def render(self) -> str:
         """Render current buffer with footer for display."""
-        text = self._current
-        if self._footer:
-            text = text.rstrip() + "\n\n" + self._footer
-        return text
+        if not self._footer:
+            return self.current_text
+        return self.current_text.rstrip() + self._footer
 
 
 class TelegramStream:
@@ -79,9 +117,27 @@ class TelegramStream:
         self.chain = MessageChain()
         self._current_msg: Message | None = None
         self._first_msg: Message | None = None
-        self._last_update: float = 0.0
+        # Pending throttle timer: while armed, pushes only bump _rev; when it
+        # fires, any unflushed revision is flushed and the timer re-armed.
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_flush: asyncio.Task | None = None
         self._lock = asyncio.Lock()
-        self._dirty = False
+        # Bumped on every push; a flush is due only when it moved past the
+        # revision last shown in Telegram.
+        self._rev = 0
+        self._last_flushed_rev = 0
+        # Text growth below min_growth chars is held back for one tick unless
+        # something structural (tool line, result) was pushed or nothing has
+        # been shown yet; sub-word updates aren't worth an edit.
+        self.min_growth = 64
+        self._shown_len = 0
+        self._structural = False
+        self._deferred = False
+        # Render cache: last md_to_html input/output, and the last successful
+        # edit as (message, html, markup) so identical re-edits are skipped.
+        self._last_text: str | None = None
+        self._last_html: str = ""
+        self._last_sent: tuple | None = None
 
     async def start(self) -> Message:
         self._current_msg = await self.bot.send_message(chat_id=self.chat_id, text="⏳ Thinking...", reply_markup=self.reply_markup)
@@ -90,51 +146,115 @@ class TelegramStream:
 
     async def push_text(self, text: str):
         self.chain.append_text(text)
-        self._dirty = True
+        self._rev += 1
         # Split the stream into separate messages on ===MSG===. A delimiter that
         # straddles two deltas (e.g. "===MS" then "G===") just matches once the
-        # remainder arrives — `in` is False until then, so nothing leaks.
-        while self.SPLIT_MARKER in self.chain._current:
-            before, after = self.chain._current.split(self.SPLIT_MARKER, 1)
-            if before.strip():
-                self.chain._current = before
-                await self.start_new_message()  # finalize `before`, open fresh placeholder
-            self.chain._current = after  # drop the delimiter; continue with the rest
-            self._dirty = True
+        # remainder arrives — `in` is False until then, so nothing leaks. Only
+        # the tail that could hold a new delimiter is checked per delta.
+        if self.SPLIT_MARKER in self.chain.tail(len(text) + len(self.SPLIT_MARKER) - 1):
+            while self.SPLIT_MARKER in self.chain.current_text:
+                before, after = self.chain.current_text.split(self.SPLIT_MARKER, 1)
+                if before.strip():
+                    self.chain.current_text = before
+                    await self.start_new_message()  # finalize `before`, open fresh placeholder
+                self.chain.current_text = after  # drop the delimiter; continue with the rest
+                self._rev += 1
         await self._maybe_update()
 
     async def push_tool_call(self, line: str):
         self.chain.append_tool_call(line)
-        self._dirty = True
+        self._rev += 1
+        self._structural = True
         await self._maybe_update()
 
     async def push_tool_result(self, html: str):
         self.chain.append_text(html)
-        self._dirty = True
+        self._rev += 1
+        self._structural = True
         await self._maybe_update()
 
     async def _maybe_update(self):
-        now = time.time()
-        if now - self._last_update < self.update_interval:
+        if self._timer is not None:
+            return  # within update_interval of the last flush; the timer catches up
+        self._arm_timer()
+        if self._flush_due():
+            await self._flush()
+        else:
+            self._deferred = True  # the timer tick shows it regardless
+
+    def _flush_due(self) -> bool:
+        return (
+            self._deferred or self._structural or not self._shown_len
+            or len(self.chain) - self._shown_len >= self.min_growth
+        )
+
+    def _arm_timer(self):
+        self._timer = asyncio.get_running_loop().call_later(self.update_interval, self._on_timer)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self):
+        self._timer = None
+        if self._rev == self._last_flushed_rev:
             return
-        await self._flush()
+        self._arm_timer()
+        if self._timer_flush is not None and not self._timer_flush.done():
+            self._deferred = True  # previous edit still in flight; next tick retries
+        elif self._flush_due():
+            self._timer_flush = asyncio.ensure_future(self._scheduled_flush())
+        else:
+            self._deferred = True
+
+    async def _scheduled_flush(self):
+        try:
+            await self._flush()
+        except Exception as e:
+            logger.warning(f"Scheduled flush failed: {e}")
 
     async def _flush(self):
+        # Cheap no-op checks before the lock; re-checked under it below.
+        if self._rev == self._last_flushed_rev or self._current_msg is None:
+            return
         async with self._lock:
-            if not self._dirty or not self._current_msg:
+            rev = self._rev
+            if rev == self._last_flushed_rev or not self._current_msg:
                 return
             if self.chain.needs_new_message:
                 completed = self.chain.complete_current()
                 await self._edit_message(self._current_msg, completed, reply_markup=None)
-                self._current_msg = await self.bot.send_message(
-                    chat_id=self.chat_id, text="⏳ ...", reply_markup=self.reply_markup,
-                    reply_to_message_id=self._first_msg.message_id,
-                )
-            display = self.chain.render()
-            if display.strip():
-                await self._edit_message(self._current_msg, display, reply_markup=self.reply_markup)
-            self._last_update = time.time()
-            self._dirty = False
+                # Open the continuation with the overflow itself rather than a
+                # placeholder that the very next edit would overwrite.
+                self._current_msg = await self._send_continuation(self.chain.render())
+            else:
+                display = self.chain.render()
+                if display.strip():
+                    await self._edit_message(self._current_msg, display, reply_markup=self.reply_markup)
+            self._last_flushed_rev = rev
+            self._shown_len = len(self.chain)
+            self._structural = self._deferred = False
+
+    async def _send_continuation(self, text: str) -> Message:
+        """Send the next message of a chain, replying to the first one."""
+        kwargs = dict(
+            chat_id=self.chat_id, reply_markup=self.reply_markup,
+            reply_to_message_id=self._first_msg.message_id,
+        )
+        if not text.strip():
+            return await self.bot.send_message(text="⏳ ...", **kwargs)
+        html_text = md_to_html(text)
+        try:
+            msg = await self.bot.send_message(
+                text=html_text, parse_mode=ParseMode.HTML, disable_web_page_preview=True, **kwargs,
+            )
+        except BadRequest as e:
+            logger.warning(f"HTML send failed: {e} (text length: {len(text)})")
+            return await self.bot.send_message(text=text[:4096], disable_web_page_preview=True, **kwargs)
+        self._last_text, self._last_html = text, html_text
+        self._last_sent = (msg, html_text, self.reply_markup)
+        return msg
 
     async def start_new_message(self):
         """Finalize current message and start a fresh one for continued output."""
@@ -150,8 +270,10 @@ class TelegramStream:
 
             # Reset for new content
             self.chain = MessageChain()
-            self._dirty = False
-            self._last_update = 0.0
+            self._last_flushed_rev = self._rev
+            self._shown_len = 0
+            self._structural = self._deferred = False
+            self._cancel_timer()  # first push into the fresh message shows at once
 
             self._current_msg = await self.bot.send_message(
                 chat_id=self.chat_id,
@@ -161,14 +283,22 @@ class TelegramStream:
             self._first_msg = self._current_msg
 
     async def finalize(self, footer: str = "", cancelled: bool = False):
+        self._cancel_timer()
+        if self._timer_flush is not None:
+            # Let an in-flight timer edit land first (outside the lock it needs),
+            # so it can't overwrite the final text or outlive the stream.
+            await self._timer_flush
+            self._timer_flush = None
         async with self._lock:
+            # A flush still queued behind the lock must not re-add the keyboard.
+            self._last_flushed_rev = self._rev
             if cancelled:
-                self.chain._current = "🛑 Cancelled\n\n" + self.chain._current
+                self.chain.prepend("🛑 Cancelled\n\n")
             if footer:
                 self.chain.set_footer(footer)
 
             # Silent pulse: treat bare "---" as no content
-            raw = self.chain._current.strip()
+            raw = self.chain.current_text.strip()
             if raw.strip("-") == "" and len(raw) <= 5 and raw:
                 if self._current_msg:
                     try:
@@ -177,7 +307,7 @@ class TelegramStream:
                         pass
                 return
 
-            has_content = bool(self.chain._current.strip() or self.chain._chunks)
+            has_content = bool(self.chain.current_text.strip() or self.chain._chunks)
             display = self.chain.render()
 
             if has_content and display.strip() and self._current_msg:
@@ -191,26 +321,40 @@ class TelegramStream:
 
     async def _edit_message(self, msg: Message, text: str, reply_markup: InlineKeyboardMarkup | None):
         try:
-            html_text = md_to_html(text)
+            if text == self._last_text:
+                html_text = self._last_html
+            else:
+                html_text = md_to_html(text)
+                self._last_text, self._last_html = text, html_text
+            sent = (msg, html_text, reply_markup)
+            if sent == self._last_sent:
+                return  # Telegram would only answer "message is not modified"
             await msg.edit_text(html_text, parse_mode=ParseMode.HTML, reply_markup=reply_markup, disable_web_page_preview=True)
+            self._last_sent = sent
             return
         except BadRequest as e:
-            if "message is not modified" in str(e).lower():
+            err = str(e).lower()
+            if "message is not modified" in err:
                 return
             logger.warning(f"HTML edit failed: {e} (text length: {len(text)})")
+            # Only markup/length rejections can succeed as plain text; for the
+            # rest (message deleted, can't be edited) go straight to a resend.
+            retry_plain = any(m in err for m in _PLAIN_RETRY_ERRORS)
         except Exception as e:
             logger.warning(f"HTML edit error: {e}")
+            retry_plain = True
 
         # Fallback: plain text (no parse_mode)
-        try:
-            await msg.edit_text(text, reply_markup=reply_markup, disable_web_page_preview=True)
-            return
-        except BadRequest as e:
-            if "message is not modified" in str(e).lower():
+        if retry_plain:
+            try:
+                await msg.edit_text(text, reply_markup=reply_markup, disable_web_page_preview=True)
                 return
-            logger.warning(f"Plain text edit failed: {e}")
-        except Exception as e:
-            logger.warning(f"Plain text edit error: {e}")
+            except BadRequest as e:
+                if "message is not modified" in str(e).lower():
+                    return
+                logger.warning(f"Plain text edit failed: {e}")
+            except Exception as e:
+                logger.warning(f"Plain text edit error: {e}")
 
         # Last resort: send new message
         try:
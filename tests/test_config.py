@@ -0,0 +1,20 @@
+"""Tests for environment-driven configuration."""
+from claude_tg.config import Config
+
+
+class TestConfig:
+    def test_reads_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("TELEGRAM_CHAT_ID", "42")
+        monkeypatch.setenv("CLAUDE_WORK_DIR", str(tmp_path))
+        monkeypatch.setenv("CLAUDE_TG_VERBOSE", "1")
+        cfg = Config()
+        assert cfg.chat_id == 42
+        assert cfg.work_dir == str(tmp_path)
+        assert cfg.verbose is True
+        assert cfg.isolate_cpu is False
+
+    def test_repr_hides_secrets(self):
+        cfg = Config(bot_token="123:secret-token", groq_api_key="gsk_secret")
+        text = repr(cfg)
+        assert "secret" not in text
+        assert "chat_id" in text
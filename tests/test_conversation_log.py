@@ -0,0 +1,85 @@
+"""Tests for the persistent conversation log."""
+import json
+import re
+
+from claude_tg.conversation_log import ConversationLog
+
+
+class TestConversationLog:
+    def test_get_recent_empty(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        assert log.get_recent() == []
+
+    def test_get_recent_returns_tail_in_order(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        for i in range(100):
+            log.log_user(f"msg {i}")
+        entries = log.get_recent(limit=3)
+        assert [e["text"] for e in entries] == ["msg 97", "msg 98", "msg 99"]
+
+    def test_get_recent_spans_read_chunks(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        for i in range(20):
+            log.log_user(f"{i}:" + "x" * 5000)
+        entries = log.get_recent(limit=5, max_chars=10**6)
+        assert [e["text"].split(":")[0] for e in entries] == ["15", "16", "17", "18", "19"]
+
+    def test_get_recent_respects_max_chars(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        for i in range(10):
+            log.log_user("y" * 100)
+        assert len(log.get_recent(limit=10, max_chars=250)) == 2
+
+    def test_get_recent_skips_bad_lines(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        log.log_user("first")
+        with open(log.path, "a", encoding="utf-8") as f:
+            f.write("not json\n\n")
+        log.log_user("second")
+        assert [e["text"] for e in log.get_recent()] == ["first", "second"]
+
+    def test_get_recent_skips_fragment_and_non_object_lines(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        log.log_user("first")
+        with open(log.path, "a", encoding="utf-8") as f:
+            f.write('1, {"role": "user", "text": "bogus"}\n42\n"str"\n')
+        log.log_user("second")
+        assert [e["text"] for e in log.get_recent()] == ["first", "second"]
+        assert log.format_context().endswith("👤 second")
+
+    def test_write_reopens_after_rotation(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        log.log_user("old")
+        log.path.rename(log.path.with_suffix(".1"))
+        log.log_user("new")
+        assert [e["text"] for e in log.get_recent()] == ["new"]
+        log.path.unlink()
+        log.log_user("again")
+        assert [e["text"] for e in log.get_recent()] == ["again"]
+        log.close()
+
+    def test_format_context(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        log.log_user("hello")
+        log.log_trigger("tick", source="cron")
+        log.log_upload({"file_id": "f1"})
+        lines = log.format_context().split("\n")
+        assert len(lines) == 2
+        assert re.match(r"^\[\d\d:\d\d\] ", lines[0])
+        assert lines[0].endswith("👤 hello")
+        assert lines[1].endswith("📥 [cron] tick")
+
+    def test_format_context_cache_invalidated_on_write(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        log.log_user("one")
+        first = log.format_context()
+        assert log.format_context() is first
+        log.log_user("two")
+        assert log.format_context().endswith("👤 two")
+
+    def test_unicode_roundtrip(self, tmp_path):
+        log = ConversationLog(str(tmp_path))
+        log.log_assistant("Привет ✅")
+        raw = log.path.read_text(encoding="utf-8").strip()
+        assert json.loads(raw)["text"] == "Привет ✅"
+        assert log.get_recent()[0]["text"] == "Привет ✅"
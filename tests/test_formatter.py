@@ -44,6 +44,19 @@ class TestMdToHtml:
         assert "<b>" not in result
         assert "&lt;html&gt;" in result
 
+    def test_fence_wins_over_stray_backtick(self):
+        result = md_to_html("a `b ```py\nc\n``` d")
+        assert result == 'a `b <pre><code class="language-py">c\n</code></pre> d'
+
+    def test_inline_span_wrapping_fence(self):
+        result = md_to_html("Type `x ```py\nprint(1)\n``` y` now")
+        assert "\x00" not in result
+        assert result == 'Type <code>x <pre><code class="language-py">print(1)\n</code></pre> y</code> now'
+
+    def test_literal_nul_placeholder_in_input(self):
+        result = md_to_html("binary: \x001\x00 and `code`")
+        assert result == "binary: 1 and <code>code</code>"
+
     def test_underscore_in_identifiers(self):
         result = md_to_html("use `send_message` function")
         assert "send_message" in result
@@ -64,6 +77,18 @@ class TestMdToHtml:
     def test_fallback_on_empty(self):
         assert md_to_html("") == ""
 
+    def test_plain_text_fast_path(self):
+        assert md_to_html("just words") == "just words"
+        assert md_to_html('a < b & "c"') == "a &lt; b &amp; &quot;c&quot;"
+
+    def test_many_placeholders_restored(self):
+        text = " ".join(f"`c{i}`" for i in range(12)) + "\n```\nblock\n```"
+        result = md_to_html(text)
+        assert "\x00" not in result
+        assert "<code>c11</code>" in result
+        assert "<code>c1</code> <code>c2</code>" in result
+        assert "<pre><code>block\n</code></pre>" in result
+
     def test_multiline_text(self):
         text = "line 1\nline 2\n**bold line**"
         result = md_to_html(text)
@@ -76,6 +101,10 @@ class TestFormatToolCall:
         assert "📂" in result
         assert "main.py" in result
 
+    def test_read_shows_last_two_components(self):
+        assert format_tool_call("Read", {"file_path": "/a/b/src/main.py"}).endswith("Read: src/main.py")
+        assert format_tool_call("Read", {"file_path": "main.py"}).endswith("Read: main.py")
+
     def test_edit(self):
         result = format_tool_call("Edit", {"file_path": "/src/main.py"})
         assert "✏️" in result
@@ -18,6 +18,7 @@ def tmp_file(tmp_path):
 def _mock_bot():
     mock = MagicMock()
     mock.send_document = AsyncMock()
+    mock.initialize = AsyncMock()
     mock.__aenter__ = AsyncMock(return_value=mock)
     mock.__aexit__ = AsyncMock(return_value=False)
     return mock
@@ -43,6 +44,16 @@ class TestSendTelegramFile:
             result = asyncio.run(send_telegram_file("/nonexistent/file.txt"))
         assert "File not found" in result
 
+    def test_file_too_large(self, tmp_file):
+        env = {"TELEGRAM_BOT_TOKEN": "tok", "TELEGRAM_CHAT_ID": "123"}
+        with patch.dict(os.environ, env, clear=False), \
+             patch("claude_tg.mcp_server.MAX_UPLOAD_BYTES", 5), \
+             patch("telegram.Bot") as mock_cls:
+            result = asyncio.run(send_telegram_file(str(tmp_file)))
+        assert "upload limit" in result
+        mock_cls.assert_not_called()
+        assert tmp_file.exists()
+
     def test_successful_send(self, tmp_file):
         env = {"TELEGRAM_BOT_TOKEN": "tok", "TELEGRAM_CHAT_ID": "123"}
         mock_bot = _mock_bot()
@@ -102,3 +113,45 @@ class TestSendTelegramFile:
              patch("telegram.Bot", return_value=mock_bot):
             with pytest.raises(Exception, match="API error"):
                 asyncio.run(send_telegram_file(str(tmp_file)))
+
+    def test_replaced_bot_is_shut_down(self, tmp_path):
+        from claude_tg import mcp_server
+
+        f = tmp_path / "a.txt"
+        bots = [_mock_bot(), _mock_bot()]
+        for b in bots:
+            b.shutdown = AsyncMock()
+
+        async def send_with_two_tokens():
+            for tok in ("tok1", "tok2"):
+                with patch.dict(os.environ, {"TELEGRAM_BOT_TOKEN": tok, "TELEGRAM_CHAT_ID": "1"}):
+                    f.write_text("x")
+                    await send_telegram_file(str(f))
+            await mcp_server._close_bot()
+
+        with patch("telegram.Bot", side_effect=bots):
+            asyncio.run(send_with_two_tokens())
+
+        bots[0].shutdown.assert_awaited_once()
+        bots[1].shutdown.assert_awaited_once()
+
+    def test_bot_reused_across_calls(self, tmp_path):
+        env = {"TELEGRAM_BOT_TOKEN": "tok", "TELEGRAM_CHAT_ID": "123"}
+        mock_bot = _mock_bot()
+        files = []
+        for name in ("a.txt", "b.txt"):
+            f = tmp_path / name
+            f.write_text("x")
+            files.append(str(f))
+
+        async def send_both():
+            for f in files:
+                await send_telegram_file(f)
+
+        with patch.dict(os.environ, env, clear=False), \
+             patch("telegram.Bot", return_value=mock_bot) as mock_cls:
+            asyncio.run(send_both())
+
+        mock_cls.assert_called_once_with(token="tok")
+        mock_bot.initialize.assert_awaited_once()
+        assert mock_bot.send_document.call_count == 2
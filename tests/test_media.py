@@ -18,7 +18,7 @@ class TestMediaHandler:
     def test_build_prompt_photo(self):
         path = os.path.join(self.tmpdir, "photo.jpg")
         open(path, "w").close()
-        self.handler._files.append(path)
+        self.handler._files.add(path)
         result = self.handler.build_prompt("describe this", [path], [])
         assert "[User sent a photo:" in result
         assert "describe this" in result
@@ -26,7 +26,7 @@ class TestMediaHandler:
     def test_build_prompt_document(self):
         path = os.path.join(self.tmpdir, "report.pdf")
         open(path, "w").close()
-        self.handler._files.append(path)
+        self.handler._files.add(path)
         result = self.handler.build_prompt("analyze", [], [path])
         assert "[User sent a file:" in result
 
@@ -38,7 +38,7 @@ class TestMediaHandler:
         path = os.path.join(self.tmpdir, "test.txt")
         with open(path, "w") as f:
             f.write("test")
-        self.handler._files.append(path)
+        self.handler._files.add(path)
         self.handler.cleanup()
         assert not os.path.exists(path)
 
@@ -51,7 +51,7 @@ class TestMediaHandler:
         for p in (keep_path, wipe_path):
             with open(p, "w") as f:
                 f.write("x")
-            self.handler._files.append(p)
+            self.handler._files.add(p)
         self.handler.cleanup(keep=[keep_path])
         assert os.path.exists(keep_path), "kept file should survive cleanup"
         assert not os.path.exists(wipe_path), "non-kept file should be removed"
@@ -69,7 +69,7 @@ class TestMediaHandler:
         # Backdate `old` by 2 days
         old_ts = _t.time() - 2 * 86400
         os.utime(old, (old_ts, old_ts))
-        self.handler._files.extend([recent, old])
+        self.handler._files.update([recent, old])
         self.handler.cleanup_all(max_age_seconds=86400)
         assert os.path.exists(recent), "recent file must not be wiped on startup"
         assert not os.path.exists(old), "stale file should be wiped on startup"
@@ -96,6 +96,11 @@ class TestStreamParser:
         assert event.type == EventType.TOOL_START
         assert event.tool_name == "Read"
 
+    def test_tool_start_event_reused_per_name(self):
+        first = self.parser.parse(make_tool_start("Read", tool_id="a"))
+        assert self.parser.parse(make_tool_start("Read", tool_id="b")) is first
+        assert self.parser.parse(make_tool_start("Bash")).tool_name == "Bash"
+
     def test_assistant_tool_use(self):
         event = self.parser.parse(
             make_assistant_tool_use("Read", {"file_path": "/tmp/test.py"})
@@ -130,6 +135,14 @@ class TestStreamParser:
         event = self.parser.parse({"type": "system", "subtype": "hook_started"})
         assert event is None
 
+    def test_malformed_stream_event_returns_none(self):
+        for data in (
+            {"type": "stream_event"},
+            {"type": "stream_event", "event": None},
+            {"type": "stream_event", "event": {"type": "content_block_delta"}},
+        ):
+            assert self.parser.parse(data) is None
+
     def test_message_stop_returns_none(self):
         event = self.parser.parse(
             {"type": "stream_event", "event": {"type": "message_stop"}, "session_id": "x"}
@@ -143,10 +156,9 @@ class TestEventQueue:
     def _make_runner(self) -> ClaudeRunner:
         return ClaudeRunner("/tmp")
 
-    @pytest.mark.asyncio
-    async def test_drain_pending_empty_queue(self):
+    def test_drain_pending_empty_queue(self):
         runner = self._make_runner()
-        await runner._drain_pending()
+        runner._drain_pending()
         assert runner._event_queue.empty()
 
     @pytest.mark.asyncio
@@ -154,21 +166,164 @@ class TestEventQueue:
         runner = self._make_runner()
         await runner._event_queue.put(RunnerEvent(type=EventType.TEXT_DELTA, text="x"))
         await runner._event_queue.put(RunnerEvent(type=EventType.RESULT, session_id="s1"))
-        await runner._drain_pending()
+        runner._drain_pending()
         assert runner._event_queue.empty()
 
+    @pytest.mark.asyncio
+    async def test_take_all_wakes_blocked_putter(self):
+        runner = self._make_runner()
+        runner._event_queue = asyncio.Queue(maxsize=1)
+        runner._event_queue.put_nowait(RunnerEvent(type=EventType.INIT))
+        putter = asyncio.create_task(runner._put_event(RunnerEvent(type=EventType.RESULT)))
+        await asyncio.sleep(0)
+        assert not putter.done()
+        assert [e.type for e in runner._take_all_events()] == [EventType.INIT]
+        await asyncio.wait_for(putter, 1)
+        assert runner._event_queue.get_nowait().type == EventType.RESULT
+
     @pytest.mark.asyncio
     async def test_drain_pending_preserves_eof(self):
         runner = self._make_runner()
         await runner._event_queue.put(RunnerEvent(type=EventType.TEXT_DELTA, text="x"))
         await runner._event_queue.put(_EOF(stderr="died", returncode=1))
-        await runner._drain_pending()
+        runner._drain_pending()
         # EOF should be back in queue
         assert not runner._event_queue.empty()
         item = runner._event_queue.get_nowait()
         assert isinstance(item, _EOF)
         assert item.stderr == "died"
 
+    @pytest.mark.asyncio
+    async def test_full_queue_buffers_deltas_in_order(self):
+        runner = self._make_runner()
+        runner._event_queue = asyncio.Queue(maxsize=2)
+        await runner._put_event(RunnerEvent(type=EventType.INIT, session_id="s1"))
+        await runner._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="a"))
+        await runner._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="b"))
+        await runner._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="c"))
+        assert runner.has_pending_events()
+
+        items = runner._take_all_events()
+        assert [(e.type, e.text) for e in items] == [
+            (EventType.INIT, ""), (EventType.TEXT_DELTA, "a"), (EventType.TEXT_DELTA, "bc"),
+        ]
+        assert runner.dropped_deltas == 0
+
+    @pytest.mark.asyncio
+    async def test_structural_event_flushes_overflow_first(self):
+        runner = self._make_runner()
+        runner._event_queue = asyncio.Queue(maxsize=1)
+        await runner._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="a"))
+        await runner._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text="b"))
+        putter = asyncio.create_task(runner._put_event(RunnerEvent(type=EventType.RESULT)))
+
+        events = [e async for e in runner._read_until_result()]
+        await putter
+        assert [(e.type, e.text) for e in events] == [
+            (EventType.TEXT_DELTA, "ab"), (EventType.RESULT, ""),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_overflow_past_cap_is_reported(self, monkeypatch):
+        import claude_tg.runner as runner_mod
+        monkeypatch.setattr(runner_mod, "_OVERFLOW_MAX", 3)
+        runner = self._make_runner()
+        runner._event_queue = asyncio.Queue(maxsize=1)
+        for t in ("q", "abc", "defg", "h"):
+            await runner._put_event(RunnerEvent(type=EventType.TEXT_DELTA, text=t))
+
+        items = runner._take_all_events()
+        assert items[0].text == "q"
+        assert items[1].text.startswith("abc\n⚠️ [5 chars of output lost")
+        assert runner.dropped_deltas == 2
+
+    @pytest.mark.asyncio
+    async def test_stdout_reader_splits_chunks_into_lines(self):
+        from unittest.mock import AsyncMock, MagicMock
+        runner = self._make_runner()
+        stdout = asyncio.StreamReader()
+        payload = b"\n".join(json.dumps(d).encode() for d in (
+            make_init("s9"), make_text_delta("a" * 100_000), make_result("s9"),
+        ))
+        # Split mid-line and leave the final line without a trailing newline
+        stdout.feed_data(payload[:70_000])
+        stdout.feed_data(payload[70_000:] + b"\nnot json")
+        stdout.feed_eof()
+        stderr = asyncio.StreamReader()
+        stderr.feed_eof()
+        runner.process = MagicMock(stdout=stdout, stderr=stderr, returncode=0)
+        runner.process.wait = AsyncMock(return_value=0)
+
+        await runner._stdout_reader()
+
+        items = [runner._event_queue.get_nowait() for _ in range(runner._event_queue.qsize())]
+        assert [type(i).__name__ for i in items] == ["RunnerEvent"] * 4 + ["_EOF"]
+        assert items[1].text == "a" * 100_000
+        assert items[2].type == EventType.RESULT
+        assert items[3].text == "not json"
+        assert runner.session_id == "s9"
+
+    @pytest.mark.asyncio
+    async def test_oversized_record_dropped(self, monkeypatch):
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg import runner as runner_mod
+        monkeypatch.setattr(runner_mod, "_MAX_RECORD", 200)
+        monkeypatch.setattr(runner_mod, "_READ_CHUNK", 16)
+        runner = self._make_runner()
+        stdout = asyncio.StreamReader()
+        stdout.feed_data(b'{"huge": "' + b"x" * 1000 + b'"}\n')
+        stdout.feed_data(json.dumps(make_init("s1")).encode() + b"\n")
+        stdout.feed_eof()
+        stderr = asyncio.StreamReader()
+        stderr.feed_eof()
+        runner.process = MagicMock(stdout=stdout, stderr=stderr, returncode=0)
+        runner.process.wait = AsyncMock(return_value=0)
+
+        await runner._stdout_reader()
+
+        items = [runner._event_queue.get_nowait() for _ in range(runner._event_queue.qsize())]
+        assert "Oversized" in items[0].text
+        assert [type(i).__name__ for i in items[1:]] == ["RunnerEvent", "_EOF"]
+        assert items[1].type == EventType.INIT
+
+    @pytest.mark.asyncio
+    async def test_eof_reports_stderr_tail(self):
+        from unittest.mock import AsyncMock, MagicMock
+        runner = self._make_runner()
+        stdout = asyncio.StreamReader()
+        stdout.feed_eof()
+        stderr = asyncio.StreamReader()
+        stderr.feed_data(b"x" * 100_000 + b"Traceback: boom\n")
+        stderr.feed_eof()
+        runner.process = MagicMock(stdout=stdout, stderr=stderr, returncode=1)
+        runner.process.wait = AsyncMock(return_value=1)
+        runner._stderr_task = asyncio.create_task(runner._stderr_reader())
+
+        await runner._stdout_reader()
+
+        eof = runner._event_queue.get_nowait()
+        assert isinstance(eof, _EOF)
+        assert eof.returncode == 1
+        assert eof.stderr.endswith("Traceback: boom")
+        assert len(eof.stderr) == 2000
+        assert sum(map(len, runner._stderr_tail)) <= 8 * 4096
+
+    @pytest.mark.asyncio
+    async def test_adjacent_deltas_coalesced(self):
+        runner = self._make_runner()
+        lines = [json.dumps(d).encode() for d in (
+            make_text_delta("Hel"), make_text_delta("lo"),
+            make_tool_start("Bash"), make_text_delta("!"),
+        )]
+        await runner._handle_lines(lines)
+
+        items = [runner._event_queue.get_nowait() for _ in range(runner._event_queue.qsize())]
+        assert [(e.type, e.text) for e in items] == [
+            (EventType.TEXT_DELTA, "Hello"),
+            (EventType.TOOL_START, ""),
+            (EventType.TEXT_DELTA, "!"),
+        ]
+
     @pytest.mark.asyncio
     async def test_read_until_result_stops_at_result(self):
         runner = self._make_runner()
@@ -187,6 +342,36 @@ class TestEventQueue:
         # Orphan still in queue
         assert not runner._event_queue.empty()
 
+    @pytest.mark.asyncio
+    async def test_read_until_result_merges_queued_deltas(self):
+        runner = self._make_runner()
+        for t in ("a", "b", "c"):
+            await runner._event_queue.put(RunnerEvent(type=EventType.TEXT_DELTA, text=t))
+        await runner._event_queue.put(RunnerEvent(type=EventType.TOOL_START))
+        await runner._event_queue.put(RunnerEvent(type=EventType.TEXT_DELTA, text="d"))
+        await runner._event_queue.put(RunnerEvent(type=EventType.RESULT, session_id="s1"))
+
+        events = [e async for e in runner._read_until_result()]
+        assert [(e.type, e.text) for e in events] == [
+            (EventType.TEXT_DELTA, "abc"), (EventType.TOOL_START, ""),
+            (EventType.TEXT_DELTA, "d"), (EventType.RESULT, ""),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_read_until_result_returns_read_ahead_on_close(self):
+        runner = self._make_runner()
+        await runner._event_queue.put(RunnerEvent(type=EventType.TEXT_DELTA, text="a"))
+        await runner._event_queue.put(_EOF(stderr="", returncode=0))
+
+        gen = runner._read_until_result()
+        assert (await gen.__anext__()).text == "a"
+        await gen.aclose()
+        # Events arriving afterwards must not overtake the read-ahead EOF
+        await runner._event_queue.put(RunnerEvent(type=EventType.INIT))
+        assert runner.has_pending_events()
+        assert isinstance(runner._get_nowait(), _EOF)
+        assert runner._get_nowait().type == EventType.INIT
+
     @pytest.mark.asyncio
     async def test_read_until_result_handles_eof(self):
         runner = self._make_runner()
@@ -252,3 +437,68 @@ class TestEventQueue:
             remaining.append(runner._event_queue.get_nowait())
         assert len(remaining) == 2
         assert remaining[0].text == "turn2"
+
+
+class TestCpuIsolation:
+    @pytest.fixture(autouse=True)
+    def _fresh_split(self):
+        import claude_tg.runner as runner_mod
+        runner_mod._cpu_split.cache_clear()
+        yield
+        runner_mod._cpu_split.cache_clear()
+
+    @pytest.mark.asyncio
+    async def test_child_spawned_with_rest_and_bot_pinned_to_cpu0(self, monkeypatch):
+        from unittest.mock import AsyncMock, MagicMock
+        import claude_tg.runner as runner_mod
+
+        calls = []
+        monkeypatch.setattr(runner_mod.os, "sched_getaffinity", lambda pid: {0, 2, 3}, raising=False)
+        monkeypatch.setattr(runner_mod.os, "sched_setaffinity",
+                            lambda tid, cpus: calls.append(("set", set(cpus))), raising=False)
+
+        async def fake_exec(*args, **kwargs):
+            calls.append(("spawn",))
+            return MagicMock(pid=42, returncode=None)
+
+        monkeypatch.setattr(runner_mod.asyncio, "create_subprocess_exec", fake_exec)
+        runner = ClaudeRunner("/tmp", isolate_cpu=True)
+        runner._stdout_reader = AsyncMock()
+        runner._stderr_reader = AsyncMock()
+        await runner._ensure_process()
+
+        spawn = calls.index(("spawn",))
+        assert calls[:spawn] == [("set", {2, 3})]  # inherited by the child
+        assert calls[spawn + 1:] == [("set", {0})]  # only the loop thread
+        # A runner built after pinning still isolates: the split isn't re-read from {0}
+        monkeypatch.setattr(runner_mod.os, "sched_getaffinity", lambda pid: {0}, raising=False)
+        assert ClaudeRunner("/tmp", isolate_cpu=True)._cpu_split == ({0}, {2, 3})
+
+        calls.clear()
+        await asyncio.to_thread(lambda: None)
+        assert calls == [("set", {0, 2, 3})]  # workers aren't confined to CPU 0
+        await runner._cleanup_reader()
+
+    def test_noop_without_cpu0(self, monkeypatch):
+        import claude_tg.runner as runner_mod
+
+        monkeypatch.setattr(runner_mod.os, "sched_getaffinity", lambda pid: {4, 5}, raising=False)
+        assert runner_mod._cpu_split() is None
+        runner_mod._cpu_split.cache_clear()
+        monkeypatch.setattr(runner_mod.os, "sched_getaffinity", lambda pid: {0}, raising=False)
+        assert runner_mod._cpu_split() is None
+
+
+class TestDiscoverMcpServers:
+    def test_reads_project_config_and_caches(self, tmp_path, monkeypatch):
+        from claude_tg import runner
+
+        monkeypatch.setenv("HOME", str(tmp_path / "home"))
+        cfg = tmp_path / ".mcp.json"
+        cfg.write_text(json.dumps({"mcpServers": {"b": {}, "a": {}}}))
+        assert runner._discover_mcp_servers(str(tmp_path)) == ["mcp__a", "mcp__b"]
+
+        calls = []
+        monkeypatch.setattr(runner.fastjson, "loads", lambda b: calls.append(b) or {})
+        assert runner._discover_mcp_servers(str(tmp_path)) == ["mcp__a", "mcp__b"]
+        assert calls == []
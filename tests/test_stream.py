@@ -29,6 +29,24 @@ class TestMessageChain:
         assert len(completed) <= 60
         assert chain.current_text  # remainder in new buffer
 
+    def test_split_prefers_late_newline(self):
+        chain = MessageChain(max_length=50)
+        chain.append_text("a" * 10 + "\n" + "b" * 20 + "\n" + "c" * 40)
+        assert chain.complete_current() == "a" * 10 + "\n" + "b" * 20
+        assert chain.current_text == "c" * 40
+
+    def test_split_ignores_early_newline(self):
+        chain = MessageChain(max_length=50)
+        chain.append_text("a" * 10 + "\n" + "b" * 60)
+        assert len(chain.complete_current()) == 50
+
+    def test_prepend(self):
+        chain = MessageChain(max_length=200)
+        chain.append_text("body")
+        chain.prepend("head ")
+        assert chain.current_text == "head body"
+        assert len(chain) == 9
+
     def test_append_tool_call(self):
         chain = MessageChain(max_length=200)
         chain.append_text("some text\n")
@@ -40,3 +58,165 @@ class TestMessageChain:
         chain.append_text("response text")
         chain.set_footer("⏱ 5s · 2 turns")
         assert "⏱ 5s · 2 turns" in chain.render()
+
+    def test_many_deltas_joined_lazily(self):
+        chain = MessageChain(max_length=200)
+        for ch in "abcdef":
+            chain.append_text(ch)
+        assert chain.tail(4) == "cdef"
+        chain.append_tool_call("🔧 Bash")
+        assert chain.current_text == "abcdef\n🔧 Bash\n"
+        assert chain.needs_new_message is False
+
+
+class TestTelegramStreamEdits:
+    async def test_identical_edit_skipped(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import TelegramStream
+
+        stream = TelegramStream(bot=MagicMock(), chat_id=1)
+        msg = MagicMock()
+        msg.edit_text = AsyncMock()
+
+        await stream._edit_message(msg, "**hi**", reply_markup=None)
+        await stream._edit_message(msg, "**hi**", reply_markup=None)
+        assert msg.edit_text.await_count == 1
+        assert msg.edit_text.call_args[0][0] == "<b>hi</b>"
+
+        markup = MagicMock()
+        await stream._edit_message(msg, "**hi**", reply_markup=markup)
+        assert msg.edit_text.await_count == 2
+
+    async def test_split_marker_across_deltas(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import TelegramStream
+
+        bot = MagicMock()
+        bot.send_message = AsyncMock(return_value=MagicMock(edit_text=AsyncMock()))
+        stream = TelegramStream(bot=bot, chat_id=1, update_interval=999)
+        await stream.start()
+        await stream.push_text("first ===MS")
+        assert bot.send_message.await_count == 1
+        await stream.push_text("G=== second")
+        assert bot.send_message.await_count == 2
+        assert stream.chain.current_text == " second"
+        stream._cancel_timer()
+
+    async def test_flush_skipped_without_new_pushes(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import TelegramStream
+
+        msg = MagicMock(edit_text=AsyncMock())
+        bot = MagicMock(send_message=AsyncMock(return_value=msg))
+        stream = TelegramStream(bot=bot, chat_id=1, update_interval=0)
+        await stream.start()
+        await stream.push_text("hello")
+        assert msg.edit_text.await_count == 1
+        stream._lock = MagicMock()  # an idle flush must not touch the lock
+        await stream._flush()
+        assert msg.edit_text.await_count == 1
+
+    async def test_pushes_within_interval_coalesced_by_timer(self):
+        import asyncio
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import TelegramStream
+
+        msg = MagicMock(edit_text=AsyncMock())
+        bot = MagicMock(send_message=AsyncMock(return_value=msg))
+        stream = TelegramStream(bot=bot, chat_id=1, update_interval=0.02)
+        await stream.start()
+        await stream.push_text("a")
+        await stream.push_text("b")
+        await stream.push_text("c")
+        assert msg.edit_text.await_count == 1  # leading edge only
+        await asyncio.sleep(0.1)
+        # "bc" is below min_growth: held for one tick, then shown
+        assert msg.edit_text.await_count == 2
+        assert msg.edit_text.call_args[0][0] == "abc"
+        await stream.finalize()
+
+    async def test_deleted_message_skips_plain_retry(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from telegram.error import BadRequest
+        from claude_tg.stream import TelegramStream
+
+        bot = MagicMock(send_message=AsyncMock())
+        stream = TelegramStream(bot=bot, chat_id=1)
+        msg = MagicMock(edit_text=AsyncMock(side_effect=BadRequest("Message to edit not found")))
+        await stream._edit_message(msg, "hi", reply_markup=None)
+        assert msg.edit_text.await_count == 1
+        bot.send_message.assert_awaited_once()
+
+    async def test_bad_entities_retried_as_plain_text(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from telegram.error import BadRequest
+        from claude_tg.stream import TelegramStream
+
+        bot = MagicMock(send_message=AsyncMock())
+        stream = TelegramStream(bot=bot, chat_id=1)
+        msg = MagicMock(edit_text=AsyncMock(side_effect=[BadRequest("Can't parse entities: x"), None]))
+        await stream._edit_message(msg, "hi", reply_markup=None)
+        assert msg.edit_text.await_count == 2
+        bot.send_message.assert_not_awaited()
+
+    async def test_small_growth_deferred_unless_structural(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import TelegramStream
+
+        msg = MagicMock(edit_text=AsyncMock())
+        bot = MagicMock(send_message=AsyncMock(return_value=msg))
+        stream = TelegramStream(bot=bot, chat_id=1, update_interval=0)
+        await stream.start()
+        await stream.push_text("first words")
+        assert msg.edit_text.await_count == 1  # replaces the placeholder at once
+        stream._cancel_timer()
+        await stream.push_text(" more")
+        assert msg.edit_text.await_count == 1
+        stream._cancel_timer()
+        await stream.push_tool_call("🔧 Bash")
+        assert msg.edit_text.await_count == 2
+        await stream.finalize()
+
+    async def test_overflow_opens_continuation_with_content(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import MessageChain, TelegramStream
+
+        first, second = MagicMock(edit_text=AsyncMock()), MagicMock(edit_text=AsyncMock())
+        bot = MagicMock(send_message=AsyncMock(side_effect=[first, second]))
+        stream = TelegramStream(bot=bot, chat_id=1, update_interval=0)
+        stream.chain = MessageChain(max_length=20)
+        await stream.start()
+        await stream.push_text("a" * 15 + "\n" + "b" * 10)
+        assert first.edit_text.call_args[0][0] == "a" * 15
+        assert bot.send_message.call_args.kwargs["text"] == "b" * 10
+        second.edit_text.assert_not_awaited()
+        await stream.finalize()
+
+    async def test_finalize_waits_for_in_flight_timer_flush(self):
+        import asyncio
+        from unittest.mock import AsyncMock, MagicMock
+        from claude_tg.stream import TelegramStream
+
+        gate = asyncio.Event()
+        calls = []
+
+        async def edit(text, **kw):
+            calls.append(text)
+            if len(calls) == 2:
+                await gate.wait()  # the timer's edit stalls on the network
+
+        msg = MagicMock(edit_text=AsyncMock(side_effect=edit))
+        bot = MagicMock(send_message=AsyncMock(return_value=msg))
+        stream = TelegramStream(bot=bot, chat_id=1, update_interval=0.01)
+        await stream.start()
+        await stream.push_text("a")
+        await stream.push_tool_call("🔧 Bash")
+        await asyncio.sleep(0.05)
+        assert len(calls) == 2  # later ticks don't stack a second timer flush
+        fin = asyncio.ensure_future(stream.finalize(footer="done"))
+        await asyncio.sleep(0.02)
+        assert len(calls) == 2 and not fin.done()
+        gate.set()
+        await fin
+        assert stream._timer_flush is None
+        assert calls[-1].endswith("done") and msg.edit_text.call_args.kwargs["reply_markup"] is None